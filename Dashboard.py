@@ -1,89 +1,199 @@
 # imports the relevant dashboard, data visualisation and dataframe libraries
+import base64
+import functools
+import hmac
+import os
+
 import dash
+import flask
 import dash_core_components as dcc
 import dash_html_components as html
-from dash.dependencies import Input, Output, State
+from dash.dependencies import ClientsideFunction, Input, Output, State
 import dash_bootstrap_components as dbc
+import numpy as np
 import pandas as pd
 import plotly.express as px
+import plotly.io as pio
+
+from covid_data import metricNames
+from data_cache import load_covid_data
+from data_prep import dataset_sources
+from data_refresh import DataRefresher, DataStore
+from downsample import defaultMaxPoints, window_indices
+from figure_cache import FigureCache
+from instrumentation import Metrics, RequestInstrumentation, metrics
+from rankings import top_on_date, top_over_range
+from shared_data import SharedDataFollower, attach_shared
+
+# this function returns the default settings of the dashboard, each can be set with an environment variable or
+# overridden by passing a dictionary to create_app. dataDir can be a local directory of the csv files or a url serving
+# them, github is used when it is not set. When sharedDir is set the dataset published there by shared_data.py is
+# memory mapped instead of being loaded by this process. clientsideRendering draws the country views in the browser.
+# The admin routes (/_refresh and /_profiling) are only served when adminToken is set, and need it in an
+# Authorization: Bearer header.
+def default_config():
+    return {'dataDir': os.environ.get('COVID_DATA_DIR'),
+            'cacheDir': os.environ.get('COVID_CACHE_DIR',
+                                       os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')),
+            'figureCacheSize': int(os.environ.get('FIGURE_CACHE_SIZE', 256)),
+            'figureCacheTTL': float(os.environ.get('FIGURE_CACHE_TTL', 3600)),
+            'refreshInterval': float(os.environ.get('COVID_REFRESH_INTERVAL', 0)),
+            'sharedDir': os.environ.get('COVID_SHARED_DIR'),
+            'sharedPollInterval': float(os.environ.get('COVID_SHARED_POLL_INTERVAL', 10)),
+            'clientsideRendering': os.environ.get('COVID_CLIENTSIDE_RENDERING', '').lower() in ('1', 'true', 'yes'),
+            'lineChartMaxPoints': int(os.environ.get('COVID_LINE_CHART_MAX_POINTS', defaultMaxPoints)),
+            'slowRequestSeconds': float(os.environ.get('COVID_SLOW_REQUEST_SECONDS', 1)),
+            'profileRequests': os.environ.get('COVID_PROFILE_REQUESTS', '').lower() in ('1', 'true', 'yes'),
+            'adminToken': os.environ.get('COVID_ADMIN_TOKEN')}
+
+
+# Gets the metric names from the dataset and puts them to a list
+headers = list(metricNames)
+
+# the ways the comparison tool can compare the selected countries
+comparisonModes = {'latest': 'Latest totals',
+                   'range': 'New cases over the date range',
+                   'series': 'Time series from the first day with {} cases'}
+
+# the number of cases a country needs before its aligned time series starts
+alignThreshold = 100
+
+# the ways the leaderboard can rank the countries, and the most countries it shows
+leaderboardModes = {'date': 'Totals on the last date',
+                    'range': 'New cases over the date range'}
+maxLeaderboardCount = 50
+
+# the series the country line chart can show, the running totals or one of the derived metrics
+lineViews = {'cumulative': 'Running totals',
+             'daily': 'Daily new cases',
+             'rolling7': '7-day average new cases',
+             'rolling14': '14-day average new cases'}
+
+# this class holds everything one app made by create_app works with: its settings, the prepared (country, date, metric)
+# dataset the callbacks read, the cache of finished figures shared by every user, the refresher checking the sources
+# for new dates and the gauges of its /metrics route. Each app keeps its own in its flask config, so creating another
+# app (e.g. in a test) leaves the first one as it was.
+class AppState:
+
+    def __init__(self, config):
+        self.config = config
+        # the dataset is only loaded the first time it is used, and a refreshed dataset can be swapped in while the
+        # app is running
+        self.store = DataStore()
+        self.figureCache = FigureCache(maxSize=config['figureCacheSize'], ttl=config['figureCacheTTL'])
+        self.store.on_publish(lambda covidData: self.figureCache.clear())
+        self.gauges = Metrics()
+        if config['sharedDir']:
+            self.refresher = SharedDataFollower(self.store, config['sharedDir'],
+                                                interval=config['sharedPollInterval'])
+            self.store.set_loader(self._load_shared)
+        else:
+            sources = dataset_sources(config['dataDir'])
+            self.refresher = DataRefresher(self.store, sources, config['cacheDir'],
+                                           interval=config['refreshInterval'])
+            self.store.set_loader(lambda: load_covid_data(sources, config['cacheDir']))
+
+    # the follower is started with the first load, so it also runs in workers forked after the app was created
+    def _load_shared(self):
+        if self.refresher.interval > 0:
+            self.refresher.start()
+        return attach_shared(self.config['sharedDir'])
+
+
+# this function returns the state of an app made by create_app
+def app_state(app):
+    return app.server.config['COVID_APP_STATE']
+
+
+# this function returns the state of the app serving the current request
+def current_state():
+    return flask.current_app.config['COVID_APP_STATE']
+
+
+# this function returns the dataset of the app serving the current request
+def current_data():
+    return current_state().store.current
+
+
+# this function stops the background refresh of an app made by create_app, e.g. once a test is done with it
+def close_app(app):
+    app_state(app).refresher.stop()
+
+
+# the callbacks of the dashboard, they are registered on the app by create_app
+callbacks = []
+
+
+# this function adds the gauges of the dataset, data refresh and figure cache of an app to its metrics. The dataset
+# gauges are left out until it has been loaded so rendering them does not load it. Dash still builds the layout on the
+# first request the app gets whatever its route, so the first /metrics scrape of a new worker loads the dataset like a
+# page load would.
+def register_gauges(state):
+    store, refresher, figureCache, gauges = state.store, state.refresher, state.figureCache, state.gauges
+
+    def loaded_data(read):
+        return lambda: read(store.current) if store.loaded else None
+
+    gauges.gauge('covid_data_version_info', loaded_data(lambda covidData: [({'version': covidData.version}, 1)]),
+                 'The version of the dataset being served')
+    gauges.gauge('covid_data_dates', loaded_data(lambda covidData: len(covidData.dates)),
+                 'The number of dates in the dataset')
+    gauges.gauge('covid_data_last_date_timestamp_seconds',
+                 loaded_data(lambda covidData: covidData.dates[-1].astype('datetime64[s]').astype('int64')),
+                 'The last date in the dataset')
+    gauges.gauge('covid_data_refresh_duration_seconds', lambda: refresher.lastRefreshDuration,
+                 'Time taken by the last data refresh that published a new dataset')
+    gauges.gauge('covid_data_last_refresh_timestamp_seconds', lambda: refresher.lastRefreshTime,
+                 'When the last new dataset was published by a refresh')
+    for counter in ['hits', 'misses', 'evictions']:
+        gauges.gauge('covid_figure_cache_{}_total'.format(counter),
+                     lambda counter=counter: figureCache.stats()[counter],
+                     'Figure cache {}'.format(counter), kind='counter')
+    gauges.gauge('covid_figure_cache_entries', lambda: figureCache.stats()['size'],
+                 'The number of figures in the figure cache')
 
-# gets the datasets URL and sets them as relevant variables
-confirmedDatasetURL = 'https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_time_series/time_series_covid19_confirmed_global.csv'
-deathsDatasetURL = 'https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_time_series/time_series_covid19_deaths_global.csv'
-recoveredDatasetURL = 'https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_time_series/time_series_covid19_recovered_global.csv'
-
-# sets the URL variables as pandas data frames
-confirmed = pd.read_csv(confirmedDatasetURL)
-deaths = pd.read_csv(deathsDatasetURL)
-recovered = pd.read_csv(recoveredDatasetURL)
-
-# unpivot data frames and updating the datasets to have one single date column
-dateOne = confirmed.columns[4:]
-confirmed = confirmed.melt(id_vars=['Province/State', 'Country/Region', 'Lat', 'Long'], value_vars=dateOne,
-                           var_name='date', value_name='confirmed')
-dateTwo = deaths.columns[4:]
-deaths = deaths.melt(id_vars=['Province/State', 'Country/Region', 'Lat', 'Long'], value_vars=dateTwo, var_name='date',
-                     value_name='deaths')
-dateThree = recovered.columns[4:]
-recovered = recovered.melt(id_vars=['Province/State', 'Country/Region', 'Lat', 'Long'], value_vars=dateThree,
-                           var_name='date', value_name='recovered')
-
-# # lowering the size in memory of the dataset to complete prep due to memory constraints
-confirmed['Lat'] = confirmed['Lat'].astype('float32')
-confirmed['Long'] = confirmed['Long'].astype('float32')
-confirmed['confirmed'] = confirmed['confirmed'].astype('int32')
-
-deaths['Lat'] = deaths['Lat'].astype('float32')
-deaths['Long'] = deaths['Long'].astype('float32')
-deaths['deaths'] = deaths['deaths'].astype('int32')
-
-recovered['Lat'] = recovered['Lat'].astype('float32')
-recovered['Long'] = recovered['Long'].astype('float32')
-recovered['recovered'] = recovered['recovered'].astype('int32')
-
-# merging the datasets into one
-completeCovid_19Dataset = confirmed.merge(right=deaths,
-                                          how='left',
-                                          on=['Province/State', 'Country/Region', 'date', 'Lat', 'Long'])
 
-completeCovid_19Dataset = completeCovid_19Dataset.merge(right=recovered,
-                                                        how='left',
-                                                        on=['Province/State', 'Country/Region', 'date', 'Lat', 'Long'])
+# this function is used like app.callback to declare a callback before the app has been created
+def callback(*args, **kwargs):
+    def decorator(function):
+        callbacks.append((args, kwargs, function))
+        return function
+
+    return decorator
 
-# setting the date to the correct format format
-completeCovid_19Dataset['date'] = pd.to_datetime(completeCovid_19Dataset['date'])
 
-# reset all N/A values to 0 in the recovered column
-completeCovid_19Dataset['recovered'] = completeCovid_19Dataset['recovered'].fillna(0)
+# this function returns whether the request carries the admin token in an Authorization: Bearer header
+def is_admin_request(token):
+    header = flask.request.headers.get('Authorization', '')
+    return header.startswith('Bearer ') and hmac.compare_digest(header[len('Bearer '):].encode(), token.encode())
 
-# calculates current active cases of covid-19
-completeCovid_19Dataset['active'] = completeCovid_19Dataset['confirmed'] - completeCovid_19Dataset['deaths'] - \
-                                    completeCovid_19Dataset['recovered']
 
-# creates a backup dataset to be used in the call backs
-backupDataSet = completeCovid_19Dataset
+# this function returns the version of the dataset the figures are made from, used as part of the cache keys
+def data_version():
+    return current_data().version
 
-# creating 2 new sub data sets based on statistics around date and the country.
-covid_19SubDataset_DCDRA = completeCovid_19Dataset.groupby(['date'])[
-    ['confirmed', 'deaths', 'recovered', 'active']].sum().reset_index()
 
-completeCovid_19Dataset = completeCovid_19Dataset.groupby(['date', 'Country/Region'])[
-    ['confirmed', 'deaths', 'recovered', 'active']].sum().reset_index()
+# this function returns a decorator that caches the output of a callback in the figure cache of the app serving the
+# request, keyed by the callback name, its inputs and the version of the dataset
+def memoize(name):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args):
+            return current_state().figureCache.fetch(name, data_version(), function, args)
 
-covid_19SubDataset_DCDRA['recovered'] = covid_19SubDataset_DCDRA['recovered'].astype('int32')
+        return wrapper
 
-covid_19SubDataset_DCDRA['active'] = covid_19SubDataset_DCDRA['active'].astype('int32')
-
-# Gets the header value from the dataframe and puts them to a list
-headers = list(completeCovid_19Dataset.columns.values.tolist()[-4:])
+    return decorator
 
 
 # ----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
 
 
-# This function loads in the world map visualisation at the top of the dashboard.
-def world_map():
-    newData = backupDataSet
+# This function loads in the world map visualisation at the top of the dashboard. Only one marker per location is
+# plotted, using the values of the selected date (the latest date by default).
+def world_map(dateIndex=-1):
+    covidData = current_data()
+    newData = covidData.snapshot(dateIndex)
     fig = px.scatter_geo(newData,
                          lat=newData['Lat'],
                          lon=newData['Long'],
@@ -91,178 +201,294 @@ def world_map():
                          hover_name='Country/Region',
                          hover_data=['Province/State'],
                          size='deaths',
+                         title='Covid-19 deaths on {}'.format(
+                             pd.Timestamp(covidData.dates[dateIndex]).strftime('%d %B %Y')),
                          )
-    fig.update_layout(template="plotly_dark")
+    # keeps the users zoom and rotation when the date is changed
+    fig.update_layout(template="plotly_dark", uirevision='world-map')
     return fig
     # fig = px.scatter_mapbox() Do not use
 
 
+# this function returns the marks shown under the world map date slider, one for the start of each year
+def map_slider_marks(covidData):
+    dates = pd.DatetimeIndex(covidData.dates)
+    return {int(position): str(dates[position].year)
+            for position in np.flatnonzero((dates.month == 1) & (dates.day == 1))}
+
+
 # ----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
 
 
-# setting up the Dash app dashboard
-app = dash.Dash(__name__, external_stylesheets=[dbc.themes.DARKLY],
-                meta_tags=[{'name': 'viewport', 'content': 'width=device-width, initial-scale=1.0'}])
-
-# this line creates the app layout using a dash container
-app.layout = dbc.Container([
-
-    # this line creates the help box at the top right of the dashboard and contains a string instructing the user how
-    # to use the dashboard.
-    dbc.Row(children=[
-        dbc.Col([
-            dbc.Button("Help?",
-                       className="float-right",
-                       size="sm",
-                       outline=False,
-                       color="secondary",
-                       id="popoverButton",
-                       ),
-
-            dbc.Popover([dbc.PopoverHeader("Help"),
-                         dbc.PopoverBody(
-                             "This page is to help You understand how to use this Covid-19 Dashboard. The first graph at the top of the dashboard is an interactive world map, where the user can hover over a country and view their current Covid-19 death statistics. The values after that show the total global deaths, recoveries, active and confirmed cases for covid-19. The second section of the dashboard allows the user to select a country from the dropdown on the left side. This will change the line and bar chart. It will also change the statistics for that country and title which will make you aware of your change. The final and bottom section of the dashboards will allow the user to create your own graph comparing countries. This is done through the first two dropdown boxes which will set X1 and X2 in the graph the third dropdown box will allow you to pick the Y of the graph choosing form death, confirmed , active or recovered cases. This will then create a graph that you can create. For all of these graphs if you hover over them the are options at the top right which the user may select these options to view all the data at the point of their mouse while hovering on the graph or zoom in to a specific section the user can highlight just to view that data  Click on the help box again to close this tab."
-                         )],
-                        id="popover",
-                        target="popoverButton",
-                        placement="bottom",
-                        is_open=False),
-        ])
-    ]),
-
-    # this is creating the title text and centers it to the center of the dashboard
-    dbc.Row(children=[dbc.Col(html.H1('Covid-19 Dashboard', className='text-center pb-2'), width=12),
-                      ], no_gutters=False),
-
-    # this creates creates a graph element of the world map that shows relevant stats based on the function above
-    dbc.Row([
-        dbc.Col(dcc.Graph(figure=world_map()), className='badge-dark p-2'),
-    ]),
-
-    # this section of code formats the total values of deaths, recoveries, confirmed and active covid cases and gets
-    # their totals from the dataframe
-    dbc.Row(
-        [dbc.Col(children=[html.H6("Total Confirmed Covid-19 Cases"),
-                           html.H5(str("{:,}".format(covid_19SubDataset_DCDRA['confirmed'].max())))],
-                 className="badge badge-secondary px-2 pb-2", width=3),
-         dbc.Col(children=[html.H6("Total Recovered Covid-19 Cases"),
-                           html.H5(str("{:,}".format(covid_19SubDataset_DCDRA['recovered'].max())))],
-                 className="badge badge-success px-2 pb-2", width=3),
-         dbc.Col(children=[html.H6("Total Deaths Due To Covid-19"),
-                           html.H5(str("{:,}".format(covid_19SubDataset_DCDRA['deaths'].max())))],
-                 className="badge badge-danger px-2 pb-2", width=3),
-         dbc.Col(children=[html.H6("Total Active Covid-19 Cases"),
-                           html.H5(str("{:,}".format(covid_19SubDataset_DCDRA['active'].max())))],
-                 className="badge badge-warning px-2 pb-2", width=3),
-         ], ),
-
-    # this section of code sets up the dropdown box for users to select the county they wish to view the stats on.
-    dbc.Row([
-        dbc.Col([dcc.Dropdown(id='countryDropdown1',
-                              className='badge-dark text-dark py-2',
-                              multi=False,
-                              value='United Kingdom',
-                              options=[{'label': x, 'value': x}
-                                       for x in sorted(completeCovid_19Dataset['Country/Region'].unique())],
-                              placeholder='Please select a country',
-                              clearable=False, ),
-
-                 dcc.Graph(id='line-chart',
-                           figure={},
-                           className="pt-2")
-                 ], className="badge-dark", width=6),
-
-        # this piece of code sets up the title so the user can see what country they have selected.
-        dbc.Col(children=[html.H5(id='Country_label',
-                                  children=[], className="badge-dark"),
-
-                          dcc.Graph(id='pie_chart',
-                                    figure={})
-                          ], className="badge-dark pt-2", width=3),
-
-        # this section of code sets up the area for daily covid data will be displayed to the user based on the
-        # country tey have selected
-        dbc.Col(children=[html.H4("Covid-19 Statistics"),
-                          html.H6('New confirmed Covid-19 Cases', className="pt-2"),
-                          html.H5(id='new_confirmed', children=[]),
-                          html.H6('New daily % for confirmed cases'),
-                          html.H6(id='NC%Increase', children=[]),
-                          html.H6('New recoveries Covid-19 Cases', className="pt-2"),
-                          html.H5(id='new_recovered', children=[]),
-                          html.H6('New daily % for recovered cases'),
-                          html.H6(id='NR%Increase', children=[]),
-                          html.H6('New deaths due to Covid-19 Cases', className="pt-2"),
-                          html.H5(id='new_deaths', children=[]),
-                          html.H6('New daily % for deaths cases'),
-                          html.H6(id='ND%Increase', children=[]),
-                          html.H6('New active Covid-19 Cases', className="pt-2"),
-                          html.H5(id='new_active', children=[]),
-                          html.H6('New daily % for active cases'),
-                          html.H6(id='NA%Increase', children=[]),
-                          ], className="badge badge-secondary pt-2", width=3),
-    ], no_gutters=False),
-
-    # sets the title for the next section
-    dbc.Row([
-        dbc.Col([html.H2("Country Comparison Tool")], className='badge-dark text-center', width=12)
-    ], no_gutters=False),
-
-    # this section of code created the 2 drop down boxes  for the user to select for the comparison graph X1, X2.
-    dbc.Row([
-        dbc.Col([dcc.Dropdown(id='countryDropdown2',
-                              multi=False, value='United Kingdom',
-                              options=[{'label': x, 'value': x}
-                                       for x in sorted(completeCovid_19Dataset['Country/Region'].unique())],
-                              placeholder='Please select a country',
-                              clearable=False, )], className='badge-dark text-dark py-2', ),
-
-        dbc.Col([dcc.Dropdown(id='countryDropdown3',
-
-                              multi=False, value='France',
-                              options=[{'label': x, 'value': x}
-                                       for x in sorted(completeCovid_19Dataset['Country/Region'].unique())],
-                              placeholder='Please select a country',
-                              clearable=False, )], className='badge-dark text-dark py-2', ),
-    ], no_gutters=False),
-
-    # this section sets up the dropdown box for the user to select the category they would like to select for the
-    # comparison graph, Y
-    dbc.Row([
-        dbc.Col([
-            dcc.Dropdown(id='catDropdown',
-                         multi=False, value='confirmed',
-                         options=[{'label': x, 'value': x}
-                                  for x in headers],
-                         placeholder='Please select a category',
-                         clearable=False, )], className='badge-dark text-dark py-2', width=12),
-
-    ], no_gutters=False),
-
-    # this section of code sets up the area for a graph to be palced
-    dbc.Row([
-        dbc.Col([
-            dcc.Graph(id='bar-chart',
-                      figure={})
-        ], className="badge-dark pb-2", width=12)
-
-    ]),
-
-    # this section of code sets up the external link to a website that holds the covid-19 polices for most of the
-    # countries in hte world.
-    dbc.Row([dbc.Col([
-        html.Label(['Link to individual countries Covid-19 polices: ',
-                    html.A('Link',
-                           href='https://www.ilo.org/global/topics/coronavirus/regional-country/country-responses/lang--en/index.htm#GB')])
-    ], className='badge-dark'),
-    ]),
-    # closes the layout container and sets fulid to false which creates the 2 line boarders at the sides of the dashabord
-], fluid=False)
+# this function returns the values the layout needs from the dataset: the country list, the date slider range and the
+# headline totals. Empty values are returned when there is no dataset, which is used to check the callbacks.
+def layout_summary(covidData, clientside=False):
+    if covidData is None:
+        return {'countryOptions': [], 'lastDateIndex': 0, 'sliderMarks': {}, 'firstDate': None, 'lastDate': None,
+                'totals': {metric: '' for metric in headers}, 'clientside': clientside}
+    return {'clientside': clientside,
+            'countryOptions': [{'label': x, 'value': x} for x in covidData.countries],
+            'lastDateIndex': len(covidData.dates) - 1,
+            'firstDate': pd.Timestamp(covidData.dates[0]).date(),
+            'lastDate': pd.Timestamp(covidData.dates[-1]).date(),
+            'sliderMarks': map_slider_marks(covidData),
+            'totals': {metric: str("{:,}".format(covidData.globalValues[:, covidData.metricIndex[metric]].max()))
+                       for metric in headers}}
+
+
+# this function creates the app layout, it is built once for every version of the dataset so the dropdowns, totals
+# and slider pick up refreshed data. The figures are left empty and filled in by their callbacks once the page loads.
+@memoize('serve_layout')
+def serve_layout():
+    state = current_state()
+    return build_layout(layout_summary(state.store.current, state.config['clientsideRendering']))
+
+
+# this function creates the app layout using a dash container
+def build_layout(summary):
+    return dbc.Container([
+
+        # this line creates the help box at the top right of the dashboard and contains a string instructing the user how
+        # to use the dashboard.
+        dbc.Row(children=[
+            dbc.Col([
+                dbc.Button("Help?",
+                           className="float-right",
+                           size="sm",
+                           outline=False,
+                           color="secondary",
+                           id="popoverButton",
+                           ),
+
+                dbc.Popover([dbc.PopoverHeader("Help"),
+                             dbc.PopoverBody(
+                                 "This page is to help You understand how to use this Covid-19 Dashboard. The first graph at the top of the dashboard is an interactive world map, where the user can hover over a country and view their current Covid-19 death statistics. The values after that show the total global deaths, recoveries, active and confirmed cases for covid-19. The second section of the dashboard allows the user to select a country from the dropdown on the left side. This will change the line and bar chart. It will also change the statistics for that country and title which will make you aware of your change. The final and bottom section of the dashboards will allow the user to create your own graph comparing countries. This is done through the first dropdown box where you can select as many countries as you like, then choose whether to compare their latest totals, the new cases between two dates or their time series lined up from the day each country reached 100 cases. The last dropdown box will allow you to pick the Y of the graph choosing form death, confirmed , active or recovered cases. This will then create a graph that you can create. Under this the leaderboard shows the countries with the most cases of the category you pick, either on the last date picked or over the date range, and the number box sets how many countries are shown. For all of these graphs if you hover over them the are options at the top right which the user may select these options to view all the data at the point of their mouse while hovering on the graph or zoom in to a specific section the user can highlight just to view that data  Click on the help box again to close this tab."
+                             )],
+                            id="popover",
+                            target="popoverButton",
+                            placement="bottom",
+                            is_open=False),
+            ])
+        ]),
+
+        # this is creating the title text and centers it to the center of the dashboard
+        dbc.Row(children=[dbc.Col(html.H1('Covid-19 Dashboard', className='text-center pb-2'), width=12),
+                          ], no_gutters=False),
+
+        # this creates creates a graph element of the world map that shows relevant stats based on the function above
+        dbc.Row([
+            dbc.Col(dcc.Graph(id='world-map', figure={}), className='badge-dark p-2'),
+        ]),
+
+        # this creates the date slider and play button under the world map, other dates are loaded from the server when
+        # they are selected instead of sending every date with the page
+        dbc.Row([
+            dbc.Col(dbc.Button("Play",
+                               id="mapPlayButton",
+                               size="sm",
+                               color="secondary",
+                               ), width=1),
+            dbc.Col(dcc.Slider(id='mapDateSlider',
+                               min=0,
+                               max=summary['lastDateIndex'],
+                               step=1,
+                               value=summary['lastDateIndex'],
+                               marks=summary['sliderMarks'],
+                               updatemode='mouseup'), width=11),
+            dcc.Interval(id='mapPlayInterval', interval=1000, disabled=True),
+        ], className='badge-dark pb-2'),
+
+        # these stores hold the country series sent to the browser when the country views are drawn clientside, and
+        # the figure template and line chart views the browser needs to draw them
+        dcc.Store(id='countrySeriesStore', storage_type='memory', data={}),
+        dcc.Store(id='countryRequest'),
+        dcc.Store(id='countryLoaded'),
+        dcc.Store(id='clientsideSettings',
+                  data={'template': pio.templates['plotly_dark'].to_plotly_json(), 'lineViews': lineViews}
+                  if summary['clientside'] else {}),
+
+        # this section of code formats the total values of deaths, recoveries, confirmed and active covid cases and gets
+        # their totals from the dataframe
+        dbc.Row(
+            [dbc.Col(children=[html.H6("Total Confirmed Covid-19 Cases"),
+                               html.H5(summary['totals']['confirmed'])],
+                     className="badge badge-secondary px-2 pb-2", width=3),
+             dbc.Col(children=[html.H6("Total Recovered Covid-19 Cases"),
+                               html.H5(summary['totals']['recovered'])],
+                     className="badge badge-success px-2 pb-2", width=3),
+             dbc.Col(children=[html.H6("Total Deaths Due To Covid-19"),
+                               html.H5(summary['totals']['deaths'])],
+                     className="badge badge-danger px-2 pb-2", width=3),
+             dbc.Col(children=[html.H6("Total Active Covid-19 Cases"),
+                               html.H5(summary['totals']['active'])],
+                     className="badge badge-warning px-2 pb-2", width=3),
+             ], ),
+
+        # this section of code sets up the dropdown box for users to select the county they wish to view the stats on.
+        dbc.Row([
+            dbc.Col([dcc.Dropdown(id='countryDropdown1',
+                                  className='badge-dark text-dark py-2',
+                                  multi=False,
+                                  value='United Kingdom',
+                                  options=summary['countryOptions'],
+                                  placeholder='Please select a country',
+                                  clearable=False, ),
+
+                     dcc.RadioItems(id='lineViewRadio',
+                                    options=[{'label': label, 'value': view} for view, label in lineViews.items()],
+                                    value='cumulative',
+                                    labelClassName='px-2',
+                                    inputClassName='mr-1'),
+
+                     dcc.Graph(id='line-chart',
+                               figure={},
+                               className="pt-2")
+                     ], className="badge-dark", width=6),
+
+            # this piece of code sets up the title so the user can see what country they have selected.
+            dbc.Col(children=[html.H5(id='Country_label',
+                                      children=[], className="badge-dark"),
+
+                              dcc.Graph(id='pie_chart',
+                                        figure={})
+                              ], className="badge-dark pt-2", width=3),
+
+            # this section of code sets up the area for daily covid data will be displayed to the user based on the
+            # country tey have selected
+            dbc.Col(children=[html.H4("Covid-19 Statistics"),
+                              html.H6('New confirmed Covid-19 Cases', className="pt-2"),
+                              html.H5(id='new_confirmed', children=[]),
+                              html.H6('New daily % for confirmed cases'),
+                              html.H6(id='NC%Increase', children=[]),
+                              html.H6('New recoveries Covid-19 Cases', className="pt-2"),
+                              html.H5(id='new_recovered', children=[]),
+                              html.H6('New daily % for recovered cases'),
+                              html.H6(id='NR%Increase', children=[]),
+                              html.H6('New deaths due to Covid-19 Cases', className="pt-2"),
+                              html.H5(id='new_deaths', children=[]),
+                              html.H6('New daily % for deaths cases'),
+                              html.H6(id='ND%Increase', children=[]),
+                              html.H6('New active Covid-19 Cases', className="pt-2"),
+                              html.H5(id='new_active', children=[]),
+                              html.H6('New daily % for active cases'),
+                              html.H6(id='NA%Increase', children=[]),
+                              html.H6('7-day average of new confirmed cases', className="pt-2"),
+                              html.H5(id='avg7_confirmed', children=[]),
+                              html.H6('Days for confirmed cases to double'),
+                              html.H6(id='doubling_confirmed', children=[]),
+                              ], className="badge badge-secondary pt-2", width=3),
+        ], no_gutters=False),
+
+        # sets the title for the next section
+        dbc.Row([
+            dbc.Col([html.H2("Country Comparison Tool")], className='badge-dark text-center', width=12)
+        ], no_gutters=False),
+
+        # this section of code creates the drop down box for the user to select any number of countries to compare
+        dbc.Row([
+            dbc.Col([dcc.Dropdown(id='countryDropdown2',
+                                  multi=True, value=['United Kingdom', 'France'],
+                                  options=summary['countryOptions'],
+                                  placeholder='Please select the countries to compare',
+                                  clearable=False, )], className='badge-dark text-dark py-2', ),
+        ], no_gutters=False),
+
+        # this section of code sets up how the countries are compared and the dates they are compared over
+        dbc.Row([
+            dbc.Col([dcc.RadioItems(id='comparisonModeRadio',
+                                    options=[{'label': label.format(alignThreshold), 'value': mode}
+                                             for mode, label in comparisonModes.items()],
+                                    value='latest',
+                                    labelClassName='px-2',
+                                    inputClassName='mr-1')], className='badge-dark py-2', width=8),
+
+            dbc.Col([dcc.DatePickerRange(id='comparisonDateRange',
+                                         min_date_allowed=summary['firstDate'],
+                                         max_date_allowed=summary['lastDate'],
+                                         start_date=summary['firstDate'],
+                                         end_date=summary['lastDate'],
+                                         display_format='DD/MM/YYYY')], className='badge-dark py-2', width=4),
+        ], no_gutters=False),
+
+        # this section sets up the dropdown box for the user to select the category they would like to select for the
+        # comparison graph, Y
+        dbc.Row([
+            dbc.Col([
+                dcc.Dropdown(id='catDropdown',
+                             multi=False, value='confirmed',
+                             options=[{'label': x, 'value': x}
+                                      for x in headers],
+                             placeholder='Please select a category',
+                             clearable=False, )], className='badge-dark text-dark py-2', width=12),
+
+        ], no_gutters=False),
+
+        # this section of code sets up the area for a graph to be palced
+        dbc.Row([
+            dbc.Col([
+                dcc.Graph(id='bar-chart',
+                          figure={})
+            ], className="badge-dark pb-2", width=12)
+
+        ]),
+
+        # sets the title for the leaderboard section
+        dbc.Row([
+            dbc.Col([html.H2("Country Leaderboard")], className='badge-dark text-center', width=12)
+        ], no_gutters=False),
+
+        # this section of code sets up the metric, dates and number of countries the leaderboard ranks the countries by
+        dbc.Row([
+            dbc.Col([dcc.Dropdown(id='leaderboardMetricDropdown',
+                                  multi=False, value='deaths',
+                                  options=[{'label': x, 'value': x} for x in headers],
+                                  placeholder='Please select a category',
+                                  clearable=False, )], className='badge-dark text-dark py-2', width=3),
+
+            dbc.Col([dcc.RadioItems(id='leaderboardModeRadio',
+                                    options=[{'label': label, 'value': mode}
+                                             for mode, label in leaderboardModes.items()],
+                                    value='date',
+                                    labelClassName='px-2',
+                                    inputClassName='mr-1')], className='badge-dark py-2', width=3),
+
+            dbc.Col([dcc.DatePickerRange(id='leaderboardDateRange',
+                                         min_date_allowed=summary['firstDate'],
+                                         max_date_allowed=summary['lastDate'],
+                                         start_date=summary['firstDate'],
+                                         end_date=summary['lastDate'],
+                                         display_format='DD/MM/YYYY')], className='badge-dark py-2', width=4),
+
+            dbc.Col([dcc.Input(id='leaderboardCountInput', type='number', min=1, max=maxLeaderboardCount, step=1,
+                               value=10)], className='badge-dark py-2', width=2),
+        ], no_gutters=False),
+
+        # this section of code sets up the area for the leaderboard to be placed
+        dbc.Row([
+            dbc.Col([
+                dcc.Graph(id='leaderboard-chart',
+                          figure={})
+            ], className="badge-dark pb-2", width=12)
+
+        ]),
+
+        # this section of code sets up the external link to a website that holds the covid-19 polices for most of the
+        # countries in hte world.
+        dbc.Row([dbc.Col([
+            html.Label(['Link to individual countries Covid-19 polices: ',
+                        html.A('Link',
+                               href='https://www.ilo.org/global/topics/coronavirus/regional-country/country-responses/lang--en/index.htm#GB')])
+        ], className='badge-dark'),
+        ]),
+        # closes the layout container and sets fulid to false which creates the 2 line boarders at the sides of the dashabord
+    ], fluid=False)
+
 
 
 # ----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
 
 # this creates a dynamic callback to open and close the help button when it is clicked
-@app.callback(
+@callback(
     Output("popover", "is_open"),
     [Input("popoverButton", "n_clicks")],
     [State("popover", "is_open")],
@@ -273,22 +499,110 @@ def toggle_popover(n, is_open):
     return is_open
 
 
-# this creates a dynamic callback to create the line chart graph based on the country selected from a drop down box
-@app.callback(
-    Output("line-chart", "figure"),
-    [Input("countryDropdown1", "value")])
-def update_line_chart(countrySelected):
-    mask = completeCovid_19Dataset['Country/Region'] == countrySelected
-    fig = px.line(completeCovid_19Dataset[mask],
-                  x="date", y=["deaths", "recovered", "active", "confirmed"],
+# this function returns the (date, metric) values of a country for a view of the line chart
+def country_values(covidData, country, view='cumulative'):
+    if view == 'cumulative':
+        return covidData.country(country)
+    return covidData.derived[view][covidData.countryIndex[country]]
+
+
+# this creates a dynamic callback to redraw the world map when a different date is selected on the slider
+@callback(
+    Output('world-map', 'figure'),
+    [Input('mapDateSlider', 'value')])
+@memoize('update_world_map')
+def update_world_map(dateIndex):
+    return world_map(dateIndex)
+
+
+# this creates a dynamic callback to start and stop the world map playback when the play button is clicked
+@callback(
+    Output('mapPlayInterval', 'disabled'),
+    Output('mapPlayButton', 'children'),
+    [Input('mapPlayButton', 'n_clicks')],
+    [State('mapPlayInterval', 'disabled')],
+    prevent_initial_call=True)
+def toggle_map_playback(n, disabled):
+    return not disabled, 'Pause' if disabled else 'Play'
+
+
+# this creates a dynamic callback to move the world map slider on a week every time the playback interval fires,
+# starting again from the first date once the end is reached
+@callback(
+    Output('mapDateSlider', 'value'),
+    [Input('mapPlayInterval', 'n_intervals')],
+    [State('mapDateSlider', 'value')],
+    prevent_initial_call=True)
+def advance_map_date(n, dateIndex):
+    covidData = current_data()
+    lastIndex = len(covidData.dates) - 1
+    if dateIndex >= lastIndex:
+        return 0
+    return min(dateIndex + 7, lastIndex)
+
+
+# this function returns the first and last date shown on the line chart from its relayoutData, or None for both when
+# the chart is not zoomed in
+def visible_range(relayoutData):
+    if not relayoutData or relayoutData.get('xaxis.autorange'):
+        return None, None
+    if 'xaxis.range[0]' in relayoutData:
+        return relayoutData['xaxis.range[0]'], relayoutData['xaxis.range[1]']
+    if 'xaxis.range' in relayoutData:
+        return tuple(relayoutData['xaxis.range'][:2])
+    return None, None
+
+
+# the relayoutData keys plotly sends when the dates shown on a chart are zoomed in or out
+dateRangeKeys = ('xaxis.range', 'xaxis.range[0]', 'xaxis.range[1]', 'xaxis.autorange')
+
+
+# this function draws the line chart of a country between two dates. Each line is thinned out to at most
+# lineChartMaxPoints points keeping the peaks and troughs, so zooming in redraws the visible dates in more detail.
+@memoize('line_chart')
+def line_chart(countrySelected, view='cumulative', startDate=None, endDate=None):
+    covidData = current_data()
+    values = country_values(covidData, countrySelected, view)
+    first = covidData.date_index(startDate) if startDate else 0
+    last = covidData.date_index(endDate) if endDate else len(covidData.dates) - 1
+    maxPoints = current_state().config['lineChartMaxPoints']
+
+    lines = []
+    for metric in ["deaths", "recovered", "active", "confirmed"]:
+        series = values[:, covidData.metricIndex[metric]]
+        keep = window_indices(series, first, last, maxPoints)
+        lines.append(pd.DataFrame({'date': covidData.dates[keep], 'variable': metric, 'value': series[keep]}))
+
+    fig = px.line(pd.concat(lines, ignore_index=True),
+                  x="date", y="value", color="variable",
                   color_discrete_sequence=['red', 'green', 'orange', 'grey'],
-                  title='Covid-19 overtime from 2020-2021')
-    fig.update_layout(template="plotly_dark")
+                  title='Covid-19 {} over time'.format(lineViews[view].lower()))
+    # the zoom is kept when the chart is redrawn, the dates outside it are only drawn again when zooming back out
+    fig.update_layout(template="plotly_dark", uirevision='line-chart')
+    if startDate and endDate:
+        fig.update_xaxes(range=[startDate, endDate])
     return fig
 
 
+# this creates a dynamic callback to create the line chart graph based on the country selected from a drop down box,
+# it is redrawn for the visible dates when the user zooms in or out
+@callback(
+    Output("line-chart", "figure"),
+    [Input("countryDropdown1", "value"),
+     Input("lineViewRadio", "value"),
+     Input("line-chart", "relayoutData")])
+def update_line_chart(countrySelected, view='cumulative', relayoutData=None):
+    # panning, zooming the y axis and resizing leave the dates shown as they are, and the chart already drawn for them
+    # is kept as redrawing the whole range would lose the detail of a zoomed in chart
+    triggers = [trigger['prop_id'] for trigger in dash.callback_context.triggered]
+    if triggers == ['line-chart.relayoutData'] and not any(key in dateRangeKeys for key in relayoutData or {}):
+        return dash.no_update
+    startDate, endDate = visible_range(relayoutData)
+    return line_chart(countrySelected, view, startDate, endDate)
+
+
 # this creates a dynamic callback to create a title based on the country selected
-@app.callback(
+@callback(
     Output("Country_label", "children"),
     [Input("countryDropdown1", "value")])
 def update_cTitle(countrySelected1):
@@ -297,18 +611,18 @@ def update_cTitle(countrySelected1):
 
 
 # this creates a dynamic callback to create a pie chart based on the country selected
-@app.callback(
+@callback(
     Output('pie_chart', 'figure'),
     [Input("countryDropdown1", "value")])
+@memoize('update_pie_chart')
 def update_pie_chart(countrySelected2):
-    newData = completeCovid_19Dataset
-    new_confirmed = newData[newData['Country/Region'] == countrySelected2]['confirmed'].iloc[-1]
-    new_deaths = newData[newData['Country/Region'] == countrySelected2]['deaths'].iloc[-1]
-    new_active = newData[newData['Country/Region'] == countrySelected2]['active'].iloc[-1]
-    new_recovered = newData[newData['Country/Region'] == countrySelected2]['recovered'].iloc[-1]
+    covidData = current_data()
+    latest = covidData.country(countrySelected2)[-1]
+    new_confirmed, new_deaths, new_recovered, new_active = (latest[covidData.metricIndex[metric]]
+                                                            for metric in ['confirmed', 'deaths', 'recovered',
+                                                                           'active'])
 
     fig = px.pie(
-        data_frame=newData,
         values=[new_deaths, new_recovered, new_active, new_confirmed],
         names=["deaths", "recovered", "active", "confirmed"],
         color=["deaths", "recovered", "active", "confirmed"],
@@ -322,7 +636,7 @@ def update_pie_chart(countrySelected2):
 
 
 # this creates a dynamic callback to create a stats based on the country selected
-@app.callback(
+@callback(
     Output('new_confirmed', 'children'),
     Output('NC%Increase', 'children'),
     Output('new_recovered', 'children'),
@@ -331,57 +645,243 @@ def update_pie_chart(countrySelected2):
     Output('ND%Increase', 'children'),
     Output('new_active', 'children'),
     Output('NA%Increase', 'children'),
+    Output('avg7_confirmed', 'children'),
+    Output('doubling_confirmed', 'children'),
     [Input("countryDropdown1", "value")]
 )
+@memoize('update_stats')
 def update_stats(dropdown1):
-    newData = completeCovid_19Dataset
-    newData = newData[newData['Country/Region'] == dropdown1]
-
-    new_confirmed = newData['confirmed'].iloc[-1] - newData['confirmed'].iloc[-2]
-    percentageIncreaseNC = ((new_confirmed / newData['confirmed'].iloc[-1]) * 100)
-
-    new_recovered = newData['recovered'].iloc[-1] - newData['recovered'].iloc[-2]
-    percentageIncreaseNR = ((new_recovered / newData['recovered'].iloc[-1]) * 100)
-
-    new_deaths = newData['deaths'].iloc[-1] - newData['deaths'].iloc[-2]
-    percentageIncreaseND = ((new_deaths / newData['deaths'].iloc[-1]) * 100)
-
-    new_active = newData['active'].iloc[-1] - newData['active'].iloc[-2]
-    percentageIncreaseNA = ((new_active / newData['active'].iloc[-1]) * 100)
-
-    container = ['{}'.format(str(new_confirmed)),
-                 str('{:.2f}'.format(percentageIncreaseNC) + '%'),
-                 '{}'.format(str(new_recovered.astype('int32'))),
-                 str('{:.2f}'.format(percentageIncreaseNR) + '%'),
-                 '{}'.format(str(new_deaths)),
-                 str('{:.2f}'.format(percentageIncreaseND) + '%'),
-                 '{}'.format(str(new_active.astype('int32'))),
-                 str('{:.2f}'.format(percentageIncreaseNA) + '%'),
-                 ]
+    covidData = current_data()
+    country = covidData.countryIndex[dropdown1]
+    derived = covidData.derived
+
+    # the percentage is the change on the previous day's total, N/A is shown when that total was 0
+    container = []
+    for metric in ['confirmed', 'recovered', 'deaths', 'active']:
+        position = covidData.metricIndex[metric]
+        percentageIncrease = derived['pctChange'][country, -1, position]
+        container.append('{}'.format(str(int(derived['daily'][country, -1, position]))))
+        container.append('N/A' if np.isnan(percentageIncrease) else str('{:.2f}'.format(percentageIncrease) + '%'))
+
+    confirmed = covidData.metricIndex['confirmed']
+    doublingTime = derived['doublingTime'][country, -1, confirmed]
+    container.append('{:,.0f}'.format(derived['rolling7'][country, -1, confirmed]))
+    container.append('Not growing' if np.isnan(doublingTime) else '{:.1f} days'.format(doublingTime))
     return container
 
 
-# this creates a dynamic callback to create a bar chart based on the 2 countries selected and the category selected
-@app.callback(
+# the callbacks that are drawn in the browser instead when the app is created with clientsideRendering
+countryViewCallbacks = [update_line_chart, update_cTitle, update_pie_chart, update_stats]
+
+
+# this function returns the series of one country for the browser: the start date, the number of days and for each
+# metric its daily changes as base64 little endian int32, which the browser adds back up into the running totals
+def encode_country_series(covidData, country):
+    values = covidData.country(country).astype('int64')
+    deltas = np.diff(values, axis=0, prepend=0).astype('<i4')
+    return {'country': country,
+            'version': covidData.version,
+            'start': pd.Timestamp(covidData.dates[0]).strftime('%Y-%m-%d'),
+            'days': len(covidData.dates),
+            'metrics': {metric: base64.b64encode(deltas[:, position].tobytes()).decode('ascii')
+                        for position, metric in enumerate(covidData.metrics)}}
+
+
+# this callback sends the series of a country the browser has asked for, it is only registered with clientsideRendering
+@memoize('load_country_series')
+def load_country_series(country):
+    return encode_country_series(current_data(), country)
+
+
+# this function registers the callbacks that draw the country views in the browser. The browser only asks the server
+# for a country it does not already have, and draws the line chart, title, pie chart and statistics itself.
+def register_clientside_country_views(app):
+    app.clientside_callback(ClientsideFunction(namespace='countryViews', function_name='request'),
+                            Output('countryRequest', 'data'),
+                            [Input('countryDropdown1', 'value')],
+                            [State('countrySeriesStore', 'data')])
+    app.callback(Output('countryLoaded', 'data'),
+                 [Input('countryRequest', 'data')],
+                 prevent_initial_call=True)(load_country_series)
+    app.clientside_callback(ClientsideFunction(namespace='countryViews', function_name='cache'),
+                            Output('countrySeriesStore', 'data'),
+                            [Input('countryLoaded', 'data')],
+                            [State('countrySeriesStore', 'data')])
+    app.clientside_callback(ClientsideFunction(namespace='countryViews', function_name='render'),
+                            [Output('line-chart', 'figure'), Output('Country_label', 'children'),
+                             Output('pie_chart', 'figure')] +
+                            [Output(component, 'children') for component in
+                             ['new_confirmed', 'NC%Increase', 'new_recovered', 'NR%Increase', 'new_deaths',
+                              'ND%Increase', 'new_active', 'NA%Increase', 'avg7_confirmed', 'doubling_confirmed']],
+                            [Input('countryDropdown1', 'value'), Input('lineViewRadio', 'value'),
+                             Input('countrySeriesStore', 'data')],
+                            [State('clientsideSettings', 'data')])
+
+
+# this function returns the comparison of the selected countries as a small data frame, worked out from the dataset
+# arrays so only the points that are plotted are ever built:
+#   latest  one row per country with its value on the last date of the range
+#   range   one row per country with the change over the range, i.e. the new cases between the two dates
+#   series  one row per country and day, counted from the day the country first reached alignThreshold in the range
+def comparison_frame(covidData, countries, metric, mode='latest', startDate=None, endDate=None):
+    first = covidData.date_index(startDate) if startDate else 0
+    last = covidData.date_index(endDate) if endDate else len(covidData.dates) - 1
+    first = min(first, last)
+    rows = [covidData.countryIndex[country] for country in countries if country in covidData.countryIndex]
+    values = covidData.values[rows, :, covidData.metricIndex[metric]]
+    names = covidData.countries[rows]
+
+    if mode == 'latest':
+        return pd.DataFrame({'Country/Region': names, metric: values[:, last]})
+    if mode == 'range':
+        before = values[:, first - 1] if first > 0 else 0
+        return pd.DataFrame({'Country/Region': names, metric: values[:, last] - before})
+
+    frames = []
+    for name, series in zip(names, values[:, first:last + 1]):
+        reached = np.flatnonzero(series >= alignThreshold)
+        if len(reached):
+            aligned = series[reached[0]:]
+            frames.append(pd.DataFrame({'Country/Region': name, 'day': np.arange(len(aligned)), metric: aligned}))
+    if not frames:
+        return pd.DataFrame({'Country/Region': [], 'day': [], metric: []})
+    return pd.concat(frames, ignore_index=True)
+
+
+# this creates a dynamic callback to compare the selected countries by the category selected
+@callback(
     Output('bar-chart', 'figure'),
     [Input('countryDropdown2', 'value'),
-     Input('countryDropdown3', 'value'),
-     Input('catDropdown', 'value')]
+     Input('catDropdown', 'value'),
+     Input('comparisonModeRadio', 'value'),
+     Input('comparisonDateRange', 'start_date'),
+     Input('comparisonDateRange', 'end_date')]
 )
-def comparisonGraph(dropdown1, dropdown2, catDropdown):
-    newData = completeCovid_19Dataset
-    country1 = newData[newData['Country/Region'] == dropdown1]
-    country2 = newData[newData['Country/Region'] == dropdown2]
-    Dataset = pd.concat([country1, country2], axis=0)
-    fig = px.bar(Dataset,
-                 x='Country/Region',
-                 y=catDropdown,
-                 color='Country/Region'
+@memoize('comparisonGraph')
+def comparisonGraph(countries, catDropdown, mode='latest', startDate=None, endDate=None):
+    if isinstance(countries, str):
+        countries = [countries]
+    Dataset = comparison_frame(current_data(), countries or [], catDropdown, mode, startDate, endDate)
+    if mode == 'series':
+        fig = px.line(Dataset,
+                      x='day',
+                      y=catDropdown,
+                      color='Country/Region',
+                      labels={'day': 'Days since {} {}'.format(alignThreshold, catDropdown)})
+    else:
+        fig = px.bar(Dataset,
+                     x='Country/Region',
+                     y=catDropdown,
+                     color='Country/Region',
+                     title=comparisonModes[mode]
+                     )
+    fig.update_layout(template="plotly_dark")
+    return fig
+
+
+# this creates a dynamic callback to rank the countries by the category selected, either by their totals on the last
+# date picked or by their new cases over the date range. The answers come from the rankings precomputed for each
+# version of the dataset, so no grouping of the data is done here.
+@callback(
+    Output('leaderboard-chart', 'figure'),
+    [Input('leaderboardMetricDropdown', 'value'),
+     Input('leaderboardModeRadio', 'value'),
+     Input('leaderboardDateRange', 'start_date'),
+     Input('leaderboardDateRange', 'end_date'),
+     Input('leaderboardCountInput', 'value')]
+)
+@memoize('update_leaderboard')
+def update_leaderboard(metric, mode='date', startDate=None, endDate=None, count=10):
+    covidData = current_data()
+    # the number box sends None while it holds something that is not a number
+    count = min(max(int(count or 10), 1), maxLeaderboardCount, len(covidData.countries))
+    last = covidData.date_index(endDate) if endDate else len(covidData.dates) - 1
+    if mode == 'range':
+        first = min(covidData.date_index(startDate) if startDate else 0, last)
+        countries, values = top_over_range(covidData, metric, first, last, count)
+    else:
+        countries, values = top_on_date(covidData, metric, last, count)
+
+    fig = px.bar(x=values,
+                 y=covidData.countries[countries],
+                 orientation='h',
+                 labels={'x': metric, 'y': 'Country/Region'},
+                 title='Top {} countries: {}'.format(len(countries), leaderboardModes[mode].lower())
                  )
+    fig.update_yaxes(autorange='reversed')
     fig.update_layout(template="plotly_dark")
     return fig
 
 
+# ----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+# this function creates the dash app. Nothing is loaded from the datasets until the first page is requested, so
+# importing this module and starting a server worker stay fast. Each app gets its own dataset, figure cache and
+# refresher, see AppState.
+def create_app(config=None):
+    config = dict(default_config(), **(config or {}))
+    state = AppState(config)
+
+    # setting up the Dash app dashboard
+    app = dash.Dash(__name__, external_stylesheets=[dbc.themes.DARKLY],
+                    meta_tags=[{'name': 'viewport', 'content': 'width=device-width, initial-scale=1.0'}])
+    app.server.config['COVID_APP_STATE'] = state
+
+    # the callbacks are checked against an empty copy of the layout so the dataset is not loaded here
+    app.validation_layout = build_layout(layout_summary(None, config['clientsideRendering']))
+    app.layout = serve_layout
+    for args, kwargs, function in callbacks:
+        if config['clientsideRendering'] and function in countryViewCallbacks:
+            continue
+        app.callback(*args, **kwargs)(function)
+    if config['clientsideRendering']:
+        register_clientside_country_views(app)
+
+    # times every callback and page load for the /metrics route, and logs the slow ones
+    instrumentation = RequestInstrumentation(app, slowSeconds=config['slowRequestSeconds'],
+                                             profiling=config['profileRequests'])
+    register_gauges(state)
+
+    # this route serves the callback and data preparation metrics of the process and the dataset and figure cache
+    # metrics of the app in the Prometheus text format
+    @app.server.route('/metrics')
+    def serve_metrics():
+        return app.server.response_class(metrics.render() + state.gauges.render(),
+                                         mimetype='text/plain; version=0.0.4')
+
+    # this route reports the hit and miss counters of the figure cache so its size can be tuned
+    @app.server.route('/_cache-stats')
+    def cache_stats():
+        return state.figureCache.stats()
+
+    # the admin routes change the running app, so they are only served when an admin token has been set
+    if config['adminToken']:
+        # this route checks the sources for new dates straight away and reports whether a new dataset was published
+        @app.server.route('/_refresh', methods=['POST'])
+        def refresh_data():
+            if not is_admin_request(config['adminToken']):
+                flask.abort(403)
+            return {'refreshed': state.refresher.refresh(), 'version': data_version()}
+
+        # this route switches the profiling of slow requests on or off while the app is running, e.g. posting enabled=1
+        @app.server.route('/_profiling', methods=['POST'])
+        def toggle_profiling():
+            if not is_admin_request(config['adminToken']):
+                flask.abort(403)
+            enabled = flask.request.values.get('enabled', '')
+            instrumentation.profiling = enabled.lower() in ('1', 'true', 'yes')
+            return {'profiling': instrumentation.profiling}
+
+    # starts the scheduled refresh when an interval has been set
+    if not config['sharedDir'] and state.refresher.interval > 0:
+        state.refresher.start()
+    return app
+
+
+# creates the app, the flask server is used when running under a wsgi server (e.g. gunicorn Dashboard:server)
+app = create_app()
+server = app.server
+
 # this runs the code above
 if __name__ == "__main__":
     app.run_server(debug=False)
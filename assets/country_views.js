@@ -0,0 +1,133 @@
+// these functions draw the country line chart, title, pie chart and statistics in the browser when the dashboard is
+// run with clientside rendering. Each country's series is fetched from the server once, as base64 int32 daily
+// changes, and kept in the countrySeriesStore so switching back to a country needs no server work at all.
+window.dash_clientside = window.dash_clientside || {};
+
+(function () {
+    var colours = {deaths: 'red', recovered: 'green', active: 'orange', confirmed: 'grey'};
+    var lineOrder = ['deaths', 'recovered', 'active', 'confirmed'];
+    var statsOrder = ['confirmed', 'recovered', 'deaths', 'active'];
+
+    // this function turns the base64 daily changes back into the running totals of a metric
+    function decodeSeries(encoded) {
+        var binary = atob(encoded);
+        var bytes = new Uint8Array(binary.length);
+        for (var i = 0; i < binary.length; i++) {
+            bytes[i] = binary.charCodeAt(i);
+        }
+        var deltas = new Int32Array(bytes.buffer);
+        var totals = new Float64Array(deltas.length);
+        var running = 0;
+        for (var day = 0; day < deltas.length; day++) {
+            running += deltas[day];
+            totals[day] = running;
+        }
+        return totals;
+    }
+
+    // the decoded series, kept outside the store so each one is only decoded once
+    var decodedSeries = {};
+
+    // this function returns the decoded series of a country in the store, or null if the browser does not have it yet
+    function countrySeries(store, country) {
+        var entry = store && store[country];
+        if (!entry) {
+            return null;
+        }
+        var key = country + '@' + entry.version;
+        if (!decodedSeries[key]) {
+            var decoded = {days: entry.days, series: {}, dates: []};
+            Object.keys(entry.metrics).forEach(function (metric) {
+                decoded.series[metric] = decodeSeries(entry.metrics[metric]);
+            });
+            var start = Date.parse(entry.start + 'T00:00:00Z');
+            for (var day = 0; day < entry.days; day++) {
+                decoded.dates.push(new Date(start + day * 86400000).toISOString().slice(0, 10));
+            }
+            decodedSeries[key] = decoded;
+        }
+        return decodedSeries[key];
+    }
+
+    // this function works out a view of the running totals, the same way derived_metrics.py does on the server
+    function viewOf(totals, view) {
+        if (view === 'cumulative') {
+            return Array.from(totals);
+        }
+        var span = {daily: 1, rolling7: 7, rolling14: 14}[view];
+        var result = new Array(totals.length);
+        for (var day = 0; day < totals.length; day++) {
+            var earlier = day >= span ? totals[day - span] : 0;
+            result[day] = (totals[day] - earlier) / Math.min(day + 1, span);
+        }
+        return result;
+    }
+
+    window.dash_clientside.countryViews = {
+        // asks the server for a country's series, unless the browser already has it
+        request: function (country, store) {
+            if (!country || (store && store[country])) {
+                return window.dash_clientside.no_update;
+            }
+            return country;
+        },
+
+        // adds a series sent by the server to the browser's store
+        cache: function (loaded, store) {
+            if (!loaded) {
+                return window.dash_clientside.no_update;
+            }
+            var updated = Object.assign({}, store || {});
+            updated[loaded.country] = loaded;
+            return updated;
+        },
+
+        // draws the line chart, title, pie chart and statistics of the selected country
+        render: function (country, view, store, settings) {
+            var entry = countrySeries(store, country);
+            var noUpdate = window.dash_clientside.no_update;
+            if (!entry) {
+                return [noUpdate, noUpdate, noUpdate].concat(new Array(10).fill(noUpdate));
+            }
+            var series = entry.series;
+            var last = entry.days - 1;
+
+            var lineFigure = {
+                data: lineOrder.map(function (metric) {
+                    return {type: 'scatter', mode: 'lines', name: metric, x: entry.dates,
+                            y: viewOf(series[metric], view), line: {color: colours[metric]},
+                            hovertemplate: 'variable=' + metric + '<br>date=%{x}<br>value=%{y}<extra></extra>'};
+                }),
+                layout: {template: settings.template,
+                         title: {text: 'Covid-19 ' + settings.lineViews[view].toLowerCase() + ' over time'},
+                         xaxis: {title: {text: 'date'}}, yaxis: {title: {text: 'value'}},
+                         legend: {title: {text: 'variable'}}}
+            };
+
+            var pieFigure = {
+                data: [{type: 'pie', hole: 0.3, labels: lineOrder, values: lineOrder.map(function (metric) {
+                    return series[metric][last];
+                }), marker: {colors: lineOrder.map(function (metric) {
+                    return colours[metric];
+                })}}],
+                layout: {template: settings.template, title: {text: 'Covid-19 Date Percentages'}}
+            };
+
+            var stats = [];
+            statsOrder.forEach(function (metric) {
+                var today = series[metric][last];
+                var yesterday = last > 0 ? series[metric][last - 1] : 0;
+                var change = today - yesterday;
+                stats.push(String(change));
+                stats.push(yesterday !== 0 ? (change / yesterday * 100).toFixed(2) + '%' : 'N/A');
+            });
+            var confirmed = series.confirmed;
+            var weekAgo = last >= 7 ? confirmed[last - 7] : 0;
+            stats.push(Math.round(viewOf(confirmed, 'rolling7')[last]).toLocaleString('en-US'));
+            stats.push(last >= 7 && weekAgo > 0 && confirmed[last] > weekAgo ?
+                (7 * Math.log(2) / Math.log(confirmed[last] / weekAgo)).toFixed(1) + ' days' : 'Not growing');
+
+            return [lineFigure, 'Covid-19 Stats for: ' + country, pieFigure].concat(stats);
+        }
+    };
+})();
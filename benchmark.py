@@ -0,0 +1,178 @@
+# this script times and memory profiles every stage of the data preparation and every callback of the dashboard, and
+# saves the results as json so later runs can be compared against it. Synthetic datasets are generated when no data
+# directory is given, so it can be run offline.
+#
+#   python benchmark.py --output baseline.json
+#   python benchmark.py --scale 10 --compare baseline.json
+import argparse
+import gc
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import plotly
+
+import Dashboard
+import data_prep
+from data_cache import load_dataset, save_dataset
+from ingest import ingest_covid_data
+from rankings import top_on_date, top_over_range
+from synthetic_data import defaultDays, defaultLocations, generate_datasets
+
+
+# this function runs a function a number of times and returns its result with the median time and the peak memory
+# it allocated. The memory is measured on a separate run as tracemalloc slows the code down.
+def measure(function, *args, repeat=3):
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        result = function(*args)
+        times.append(time.perf_counter() - started)
+    gc.collect()
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, {'seconds': statistics.median(times), 'peakBytes': peak}
+
+
+# this function returns the size in bytes of a callback output once it has been turned into json for the browser
+def payload_size(output):
+    return len(json.dumps(output, cls=plotly.utils.PlotlyJSONEncoder))
+
+
+# this function times each stage of the original pandas preparation and of the array preparation now used
+def benchmark_prep(sources, repeat):
+    results = {}
+    raw, results['prep.read'] = measure(data_prep.read_datasets, sources, repeat=repeat)
+    # the stages change the frames they are given, so every run works on copies
+    melted, results['prep.melt'] = measure(lambda: data_prep.melt_datasets(*raw), repeat=repeat)
+    cast, results['prep.cast'] = measure(lambda: data_prep.cast_datasets(*[frame.copy() for frame in melted]),
+                                         repeat=repeat)
+    merged, results['prep.merge'] = measure(lambda: data_prep.merge_datasets(*cast), repeat=repeat)
+    _, results['prep.groupby'] = measure(lambda: data_prep.aggregate_datasets(merged), repeat=repeat)
+    covidData, results['prep.build_covid_data'] = measure(lambda: data_prep.build_covid_data(*raw), repeat=repeat)
+    _, results['prep.ingest'] = measure(ingest_covid_data, sources, repeat=repeat)
+
+    with tempfile.TemporaryDirectory() as cacheDir:
+        _, results['prep.cache_save'] = measure(save_dataset, cacheDir, 'benchmark', covidData, repeat=repeat)
+        _, results['prep.cache_load'] = measure(load_dataset, cacheDir, 'benchmark', repeat=repeat)
+    return results
+
+
+# this function times every callback and records the size of its output, the figure cache is bypassed so the time
+# is the cost of building the output
+def benchmark_callbacks(dataDir, repeat):
+    with tempfile.TemporaryDirectory() as cacheDir:
+        app = Dashboard.create_app({'dataDir': dataDir, 'cacheDir': cacheDir, 'refreshInterval': 0, 'sharedDir': None})
+        # the callbacks read the dataset and settings of the app they are running in
+        with app.server.app_context():
+            covidData = Dashboard.current_data()
+            country, otherCountry = covidData.countries[0], covidData.countries[-1]
+            if 'United Kingdom' in covidData.countryIndex and 'France' in covidData.countryIndex:
+                country, otherCountry = 'United Kingdom', 'France'
+
+            calls = {'world_map': (Dashboard.world_map,),
+                     'update_line_chart': (Dashboard.line_chart.__wrapped__, country),
+                     'update_line_chart.zoomed': (Dashboard.line_chart.__wrapped__, country, 'daily',
+                                                  str(covidData.dates[-90])[:10], str(covidData.dates[-1])[:10]),
+                     'update_pie_chart': (Dashboard.update_pie_chart.__wrapped__, country),
+                     'update_stats': (Dashboard.update_stats.__wrapped__, country),
+                     'comparisonGraph': (Dashboard.comparisonGraph.__wrapped__, [country, otherCountry], 'confirmed'),
+                     'comparisonGraph.range': (Dashboard.comparisonGraph.__wrapped__, list(covidData.countries[:20]),
+                                               'confirmed', 'range', str(covidData.dates[-30])[:10]),
+                     'comparisonGraph.series': (Dashboard.comparisonGraph.__wrapped__, list(covidData.countries[:20]),
+                                                'confirmed', 'series'),
+                     'update_leaderboard': (Dashboard.update_leaderboard.__wrapped__, 'deaths', 'date', None, None, 10),
+                     'update_leaderboard.range': (Dashboard.update_leaderboard.__wrapped__, 'confirmed', 'range',
+                                                  str(covidData.dates[-90])[:10], str(covidData.dates[-1])[:10], 10),
+                     'rankings.top_on_date': (top_on_date, covidData, 'deaths', -1, 10),
+                     'rankings.top_over_range': (top_over_range, covidData, 'confirmed', len(covidData.dates) - 90,
+                                                 len(covidData.dates) - 1, 10),
+                     'layout': (lambda: Dashboard.build_layout(Dashboard.layout_summary(covidData)),)}
+            results = {}
+            for name, (function, *args) in calls.items():
+                output, results['callback.' + name] = measure(function, *args, repeat=repeat)
+                results['callback.' + name]['payloadBytes'] = payload_size(output)
+            return results
+
+
+# this function prints how each result has changed from a baseline and returns what got worse than the tolerance
+# allows, as "benchmark measure" names. The time, peak memory and json size are each checked, and a change smaller than
+# minSeconds or minBytes never counts, so timer noise on sub millisecond callbacks does not fail the comparison.
+def compare(results, baseline, tolerance, minSeconds=0.005, minBytes=65536):
+    regressions = []
+    print('{:<32}{:>12}{:>12}{:>9}{:>14}{:>14}{:>12}{:>12}'.format('benchmark', 'base (s)', 'now (s)', 'ratio',
+                                                                   'base peak', 'now peak', 'base json', 'now json'))
+    for name, result in sorted(results.items()):
+        before = baseline.get(name)
+        if before is None:
+            print('{:<32}{:>12}{:>12.4f}'.format(name, '-', result['seconds']))
+            continue
+        ratio = result['seconds'] / before['seconds'] if before['seconds'] else float('inf')
+        print('{:<32}{:>12.4f}{:>12.4f}{:>9.2f}{:>14,}{:>14,}{:>12}{:>12}'.format(
+            name, before['seconds'], result['seconds'], ratio, before['peakBytes'], result['peakBytes'],
+            '{:,}'.format(before['payloadBytes']) if 'payloadBytes' in before else '-',
+            '{:,}'.format(result['payloadBytes']) if 'payloadBytes' in result else '-'))
+
+        for measure, minimum in [('seconds', minSeconds), ('peakBytes', minBytes), ('payloadBytes', minBytes)]:
+            if measure in result and measure in before and result[measure] - before[measure] > max(
+                    before[measure] * tolerance, minimum):
+                regressions.append('{} {}'.format(name, measure))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks the data preparation and callbacks of the dashboard')
+    parser.add_argument('--data-dir', help='directory of the csv files, synthetic data is generated when not set')
+    parser.add_argument('--scale', type=float, default=1,
+                        help='size of the synthetic data compared to the real datasets, applied to the number of days')
+    parser.add_argument('--locations', type=int, help='number of synthetic locations (overrides the default)')
+    parser.add_argument('--days', type=int, help='number of synthetic days (overrides --scale)')
+    parser.add_argument('--repeat', type=int, default=3, help='times each benchmark is run, the median is kept')
+    parser.add_argument('--output', help='file the results are saved to as json')
+    parser.add_argument('--compare', help='results file of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed growth of the time, peak memory or json size before failing --compare')
+    parser.add_argument('--min-seconds', type=float, default=0.005,
+                        help='slow downs smaller than this many seconds never fail --compare')
+    parser.add_argument('--min-bytes', type=int, default=65536,
+                        help='growth in peak memory or json size smaller than this many bytes never fails --compare')
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as syntheticDir:
+        dataDir = arguments.data_dir
+        locations = arguments.locations or defaultLocations
+        days = arguments.days or int(defaultDays * arguments.scale)
+        if dataDir is None:
+            dataDir = syntheticDir
+            generate_datasets(dataDir, locations=locations, days=days)
+
+        results = benchmark_prep(data_prep.dataset_sources(dataDir), arguments.repeat)
+        results.update(benchmark_callbacks(dataDir, arguments.repeat))
+
+    report = {'meta': {'dataDir': arguments.data_dir, 'locations': None if arguments.data_dir else locations,
+                       'days': None if arguments.data_dir else days, 'repeat': arguments.repeat,
+                       'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+                       'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+              'results': results}
+    if arguments.output:
+        with open(arguments.output, 'w') as outputFile:
+            json.dump(report, outputFile, indent=2)
+
+    if arguments.compare:
+        with open(arguments.compare) as baselineFile:
+            regressions = compare(results, json.load(baselineFile)['results'], arguments.tolerance,
+                                  arguments.min_seconds, arguments.min_bytes)
+        if regressions:
+            print('worse than the baseline: ' + ', '.join(regressions), file=sys.stderr)
+            sys.exit(1)
+    else:
+        print(json.dumps(results, indent=2))
@@ -0,0 +1,198 @@
+# imports the array and dataframe libraries used to hold the prepared covid-19 data
+import numpy as np
+import pandas as pd
+
+from derived_metrics import compute_derived, derivedNames, extend_derived
+from rankings import compute_rankings, extend_rankings
+
+# the columns that identify a location in the John Hopkins University datasets
+locationColumns = ['Province/State', 'Country/Region', 'Lat', 'Long']
+
+# the metrics held by the dataset, in the order of the last axis of the value arrays
+metricNames = ['confirmed', 'deaths', 'recovered', 'active']
+
+
+# this class holds the prepared dataset as dense numpy arrays. The per country values are a (country, date, metric)
+# int32 cube so the callbacks can get a country's data by integer indexing instead of filtering a long data frame.
+# The long data frames the dashboard used before are only built when something asks for them.
+class CovidData:
+
+    def __init__(self, dates, countries, values, provinces, locationCountries, lat, long, locationValues,
+                 version=None):
+        self.dates = dates
+        self.countries = countries
+        self.values = values
+        self.provinces = provinces
+        self.locationCountries = locationCountries
+        self.lat = lat
+        self.long = long
+        self.locationValues = locationValues
+        self.version = version
+        self.metrics = list(metricNames)
+        self.metricIndex = {metric: position for position, metric in enumerate(self.metrics)}
+        self.countryIndex = {country: position for position, country in enumerate(countries)}
+        self._computed = {}
+
+    # the derived metrics (daily changes, rolling averages, percentage change and doubling time) of every country, each
+    # a float32 (country, date, metric) array. They are worked out once for each version of the dataset.
+    @property
+    def derived(self):
+        if 'derived' not in self._computed:
+            self._computed['derived'] = compute_derived(self.values)
+        return self._computed['derived']
+
+    # the order of the countries on every date for every metric, highest first, as an int32 (date, metric, country)
+    # array. It is worked out once for each version of the dataset and is what the leaderboard reads.
+    @property
+    def rankings(self):
+        if 'rankings' not in self._computed:
+            self._computed['rankings'] = compute_rankings(self.values)
+        return self._computed['rankings']
+
+    # the global totals per date, shape (date, metric)
+    @property
+    def globalValues(self):
+        if 'global' not in self._computed:
+            self._computed['global'] = self.values.sum(axis=0, dtype='int64')
+        return self._computed['global']
+
+    # the size in bytes of the arrays of the dataset
+    @property
+    def nbytes(self):
+        return sum(values.nbytes for values in [self.dates, self.values, self.locationCountries, self.lat, self.long,
+                                                self.locationValues])
+
+    # this function returns the (date, metric) values of a single country
+    def country(self, country):
+        return self.values[self.countryIndex[country]]
+
+    # this function returns the position of a date on the date axis, dates outside the data are moved to its first or
+    # last date
+    def date_index(self, date):
+        position = np.searchsorted(self.dates, np.datetime64(pd.Timestamp(date).normalize(), 'ns'))
+        return int(min(position, len(self.dates) - 1))
+
+    # this function returns one row per location with the values of a single date, used by the world map so only one
+    # marker per location is plotted
+    def snapshot(self, dateIndex=-1):
+        frame = pd.DataFrame({'Province/State': self.provinces,
+                              'Country/Region': self.countries[self.locationCountries],
+                              'Lat': self.lat,
+                              'Long': self.long})
+        for position, metric in enumerate(self.metrics):
+            frame[metric] = self.locationValues[:, dateIndex, position]
+        return frame
+
+    # the per country long data frame, laid out like the old completeCovid_19Dataset
+    @property
+    def frame(self):
+        if 'country' not in self._computed:
+            countryCount, dateCount = self.values.shape[:2]
+            frame = pd.DataFrame({'date': np.repeat(self.dates, countryCount),
+                                  'Country/Region': np.tile(self.countries, dateCount)})
+            byDate = self.values.transpose(1, 0, 2).reshape(-1, len(self.metrics))
+            for position, metric in enumerate(self.metrics):
+                frame[metric] = byDate[:, position]
+            self._computed['country'] = frame
+        return self._computed['country']
+
+    # the per location long data frame, laid out like the old backupDataSet
+    @property
+    def locationFrame(self):
+        if 'location' not in self._computed:
+            locationCount, dateCount = self.locationValues.shape[:2]
+            frame = pd.DataFrame({'Province/State': np.tile(self.provinces, dateCount),
+                                  'Country/Region': np.tile(self.countries[self.locationCountries], dateCount),
+                                  'Lat': np.tile(self.lat, dateCount),
+                                  'Long': np.tile(self.long, dateCount),
+                                  'date': np.repeat(self.dates, locationCount)})
+            byDate = self.locationValues.transpose(1, 0, 2).reshape(-1, len(self.metrics))
+            for position, metric in enumerate(self.metrics):
+                frame[metric] = byDate[:, position]
+            self._computed['location'] = frame
+        return self._computed['location']
+
+    # the global totals data frame, laid out like the old covid_19SubDataset_DCDRA
+    @property
+    def globalFrame(self):
+        frame = pd.DataFrame(self.globalValues, columns=self.metrics)
+        frame.insert(0, 'date', self.dates)
+        return frame
+
+    # this function checks whether another dataset has exactly the same locations in the same order
+    def same_locations(self, other):
+        return (np.array_equal(self.countries, other.countries)
+                and np.array_equal(self.locationCountries, other.locationCountries)
+                and pd.Series(self.provinces).equals(pd.Series(other.provinces))
+                and np.array_equal(self.lat, other.lat, equal_nan=True)
+                and np.array_equal(self.long, other.long, equal_nan=True))
+
+    # this function returns the dataset of the same locations from the date at position first onwards
+    def dates_from(self, first):
+        return CovidData(self.dates[first:], self.countries, self.values[:, first:], self.provinces,
+                         self.locationCountries, self.lat, self.long, self.locationValues[:, first:],
+                         version=self.version)
+
+    # this function returns a new dataset with the dates of another dataset of the same locations appended. Only the
+    # new dates are aggregated, the existing arrays are copied across as they are.
+    def extend(self, other, version=None):
+        extended = CovidData(np.concatenate([self.dates, other.dates]), self.countries,
+                             np.concatenate([self.values, other.values], axis=1), self.provinces,
+                             self.locationCountries, self.lat, self.long,
+                             np.concatenate([self.locationValues, other.locationValues], axis=1), version=version)
+        extended._computed['global'] = np.concatenate([self.globalValues, other.globalValues])
+        if 'derived' in self._computed:
+            extended._computed['derived'] = extend_derived(self.derived, self.values, other.values)
+        if 'rankings' in self._computed:
+            extended._computed['rankings'] = extend_rankings(self.rankings, other.values)
+        return extended
+
+    # this function returns the arrays and the text labels needed to store the dataset on disk
+    def to_arrays(self):
+        arrays = {'dates': self.dates, 'values': self.values, 'locationCountries': self.locationCountries,
+                  'lat': self.lat, 'long': self.long, 'locationValues': self.locationValues}
+        for name in derivedNames:
+            arrays['derived.' + name] = self.derived[name]
+        arrays['rankings'] = self.rankings
+        labels = {'countries': self.countries.tolist(),
+                  'provinces': [None if pd.isna(province) else province for province in self.provinces]}
+        return arrays, labels
+
+    # this function creates the dataset from the arrays and labels returned by to_arrays
+    @classmethod
+    def from_arrays(cls, arrays, labels, version=None):
+        countries = np.array(labels['countries'], dtype=object)
+        provinces = np.array([np.nan if province is None else province for province in labels['provinces']],
+                             dtype=object)
+        covidData = cls(arrays['dates'], countries, arrays['values'], provinces, arrays['locationCountries'],
+                        arrays['lat'], arrays['long'], arrays['locationValues'], version=version)
+        if all('derived.' + name in arrays for name in derivedNames):
+            covidData._computed['derived'] = {name: arrays['derived.' + name] for name in derivedNames}
+        if 'rankings' in arrays:
+            covidData._computed['rankings'] = arrays['rankings']
+        return covidData
+
+
+# this function builds the dataset from the location columns, the csv date column names and the (location, date,
+# metric) values, summing the locations of each country
+def covid_data_from_locations(locations, dateColumns, locationValues, version=None):
+    countries, locationCountries = np.unique(locations['Country/Region'].to_numpy(dtype=object),
+                                             return_inverse=True)
+    values = aggregate_countries(locationValues, locationCountries, len(countries))
+
+    dates = pd.to_datetime(dateColumns, format='%m/%d/%y').to_numpy()
+    return CovidData(dates, countries, values, locations['Province/State'].to_numpy(dtype=object),
+                     locationCountries.astype('int32'), locations['Lat'].to_numpy(), locations['Long'].to_numpy(),
+                     locationValues, version=version)
+
+
+# this function sums the (location, date, metric) values into a (country, date, metric) int32 cube
+def aggregate_countries(locationValues, locationCountries, countryCount):
+    order = np.argsort(locationCountries, kind='stable')
+    starts = np.searchsorted(locationCountries[order], np.arange(countryCount))
+    values = np.empty((countryCount,) + locationValues.shape[1:], dtype='int32')
+    # the sums are worked out in int64 a block of dates at a time, so the whole array is never copied
+    for start in range(0, locationValues.shape[1], 256):
+        block = locationValues[order, start:start + 256]
+        values[:, start:start + 256] = np.add.reduceat(block, starts, axis=0, dtype='int64')
+    return values
@@ -0,0 +1,115 @@
+# imports the libraries used to store the prepared datasets on disk as memory mappable numpy files
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import urllib.request
+
+import numpy as np
+
+from covid_data import CovidData
+from ingest import ingest_covid_data
+from instrumentation import stage
+
+# the version of the on disk layout, changing this forces every existing cache to be rebuilt
+CACHE_VERSION = 3
+
+
+# this function returns a cheap fingerprint of a source csv. Local files use their modification time and size, while
+# the github files use the ETag or Last-Modified header so the file does not need to be downloaded to check it.
+# None is returned when the source can not be reached.
+def source_fingerprint(source):
+    if source.startswith(('http://', 'https://')):
+        try:
+            request = urllib.request.Request(source, method='HEAD')
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return response.headers.get('ETag') or response.headers.get('Last-Modified')
+        except OSError:
+            return None
+    try:
+        status = os.stat(source)
+    except OSError:
+        return None
+    return '{}-{}'.format(status.st_mtime_ns, status.st_size)
+
+
+# this function creates the cache key from the fingerprints of every source, None is returned if any of the sources
+# could not be fingerprinted
+def cache_key(sources):
+    digest = hashlib.sha256(str(CACHE_VERSION).encode())
+    for metric in sorted(sources):
+        fingerprint = source_fingerprint(sources[metric])
+        if fingerprint is None:
+            return None
+        digest.update('{}={}:{}\n'.format(metric, sources[metric], fingerprint).encode())
+    return digest.hexdigest()[:16]
+
+
+# this function saves the dataset arrays into a new cache directory, with the text labels kept in the manifest so every
+# file can be loaded without pickle. The directory is written under a temporary name and then renamed so a half
+# written cache is never read. Entries starting with a dot, such as pointer files, are left alone.
+@stage('cache_save')
+def save_dataset(cacheDir, key, covidData, keep=0):
+    arrays, labels = covidData.to_arrays()
+    os.makedirs(cacheDir, exist_ok=True)
+    workDir = tempfile.mkdtemp(dir=cacheDir, prefix='.tmp-')
+    for name, values in arrays.items():
+        np.save(os.path.join(workDir, name + '.npy'), values)
+    manifest = {'version': CACHE_VERSION, 'key': key, 'arrays': sorted(arrays), 'labels': labels}
+    with open(os.path.join(workDir, 'manifest.json'), 'w') as manifestFile:
+        json.dump(manifest, manifestFile)
+    # mkdtemp creates the directory as 0700, so it is opened up for workers running as another user
+    os.chmod(workDir, 0o755)
+
+    finalDir = os.path.join(cacheDir, key)
+    try:
+        os.replace(workDir, finalDir)
+    except OSError:
+        # another process saved the same key first, its copy is kept and ours thrown away
+        if not os.path.isdir(finalDir):
+            raise
+        shutil.rmtree(workDir)
+
+    # removes older caches, keeping the newest `keep` of them for readers that may still be using them
+    older = sorted((entry for entry in os.listdir(cacheDir) if entry != key and not entry.startswith('.')),
+                   key=lambda entry: os.path.getmtime(os.path.join(cacheDir, entry)), reverse=True)
+    for entry in older[keep:]:
+        shutil.rmtree(os.path.join(cacheDir, entry), ignore_errors=True)
+
+
+# this function loads the dataset of the given cache key, or returns None when there is no usable cache. With
+# mmapMode='r' the arrays are memory mapped read only instead of being read into memory.
+@stage('cache_load')
+def load_dataset(cacheDir, key, mmapMode=None):
+    directory = os.path.join(cacheDir, key)
+    try:
+        with open(os.path.join(directory, 'manifest.json')) as manifestFile:
+            manifest = json.load(manifestFile)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != CACHE_VERSION:
+        return None
+
+    arrays = {name: np.load(os.path.join(directory, name + '.npy'), mmap_mode=mmapMode, allow_pickle=False)
+              for name in manifest['arrays']}
+    return CovidData.from_arrays(arrays, manifest['labels'], version=key)
+
+
+# this function returns the prepared dataset, loading it from the cache when the sources have not changed and
+# otherwise building it from the csv files and refreshing the cache, keeping the keep newest older entries
+def load_covid_data(sources, cacheDir, keep=0):
+    key = cache_key(sources)
+    if key is None and os.path.isdir(cacheDir):
+        # the sources can not be checked (e.g. no network), so the newest existing cache is used
+        existing = [entry for entry in os.listdir(cacheDir) if not entry.startswith('.')]
+        key = max(existing, key=lambda entry: os.path.getmtime(os.path.join(cacheDir, entry))) if existing else None
+
+    covidData = load_dataset(cacheDir, key) if key else None
+    if covidData is not None:
+        return covidData
+
+    covidData = ingest_covid_data(sources, version=key)
+    if key is not None:
+        save_dataset(cacheDir, key, covidData, keep=keep)
+    return covidData
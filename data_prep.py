@@ -0,0 +1,141 @@
+# imports the array and dataframe libraries used for the data preparation
+import os
+
+import numpy as np
+import pandas as pd
+
+from covid_data import covid_data_from_locations, locationColumns, metricNames
+
+# gets the datasets URL and sets the names of the relevant files
+datasetBaseURL = 'https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_time_series/'
+datasetFiles = {'confirmed': 'time_series_covid19_confirmed_global.csv',
+                'deaths': 'time_series_covid19_deaths_global.csv',
+                'recovered': 'time_series_covid19_recovered_global.csv'}
+
+
+# this function returns the location of each of the three datasets, either from a local directory holding the csv
+# files (so the dashboard can be run and tested offline), from another url serving the same files or from the John
+# Hopkins University github
+def dataset_sources(dataDir=None):
+    if dataDir and not dataDir.startswith(('http://', 'https://')):
+        return {metric: os.path.join(dataDir, fileName) for metric, fileName in datasetFiles.items()}
+    baseURL = dataDir.rstrip('/') + '/' if dataDir else datasetBaseURL
+    return {metric: baseURL + fileName for metric, fileName in datasetFiles.items()}
+
+
+# this function reads the three datasets into pandas data frames
+def read_datasets(sources):
+    return pd.read_csv(sources['confirmed']), pd.read_csv(sources['deaths']), pd.read_csv(sources['recovered'])
+
+
+# this function takes the three raw datasets and returns the merged location dataset, the per country dataset and
+# the global totals dataset the dashboard was first built on. The dashboard now reads the files with
+# ingest.ingest_covid_data, this pipeline is kept as the reference its output is checked against and for the benchmarks,
+# so it is split into the stages below which can be timed on their own.
+def prepare_datasets(confirmed, deaths, recovered):
+    confirmed, deaths, recovered = cast_datasets(*melt_datasets(confirmed, deaths, recovered))
+    return aggregate_datasets(merge_datasets(confirmed, deaths, recovered))
+
+
+# this function unpivots the data frames, updating the datasets to have one single date column
+def melt_datasets(confirmed, deaths, recovered):
+    dateOne = confirmed.columns[4:]
+    confirmed = confirmed.melt(id_vars=['Province/State', 'Country/Region', 'Lat', 'Long'], value_vars=dateOne,
+                               var_name='date', value_name='confirmed')
+    dateTwo = deaths.columns[4:]
+    deaths = deaths.melt(id_vars=['Province/State', 'Country/Region', 'Lat', 'Long'], value_vars=dateTwo,
+                         var_name='date', value_name='deaths')
+    dateThree = recovered.columns[4:]
+    recovered = recovered.melt(id_vars=['Province/State', 'Country/Region', 'Lat', 'Long'], value_vars=dateThree,
+                               var_name='date', value_name='recovered')
+    return confirmed, deaths, recovered
+
+
+# this function lowers the size in memory of the dataset to complete prep due to memory constraints
+def cast_datasets(confirmed, deaths, recovered):
+    confirmed['Lat'] = confirmed['Lat'].astype('float32')
+    confirmed['Long'] = confirmed['Long'].astype('float32')
+    confirmed['confirmed'] = confirmed['confirmed'].astype('int32')
+
+    deaths['Lat'] = deaths['Lat'].astype('float32')
+    deaths['Long'] = deaths['Long'].astype('float32')
+    deaths['deaths'] = deaths['deaths'].astype('int32')
+
+    recovered['Lat'] = recovered['Lat'].astype('float32')
+    recovered['Long'] = recovered['Long'].astype('float32')
+    recovered['recovered'] = recovered['recovered'].astype('int32')
+    return confirmed, deaths, recovered
+
+
+# this function merges the datasets into one and calculates the active cases
+def merge_datasets(confirmed, deaths, recovered):
+    completeCovid_19Dataset = confirmed.merge(right=deaths,
+                                              how='left',
+                                              on=['Province/State', 'Country/Region', 'date', 'Lat', 'Long'])
+
+    completeCovid_19Dataset = completeCovid_19Dataset.merge(right=recovered,
+                                                            how='left',
+                                                            on=['Province/State', 'Country/Region', 'date', 'Lat',
+                                                                'Long'])
+
+    # setting the date to the correct format format
+    completeCovid_19Dataset['date'] = pd.to_datetime(completeCovid_19Dataset['date'], format='%m/%d/%y')
+
+    # reset all N/A values to 0 in the recovered column
+    completeCovid_19Dataset['recovered'] = completeCovid_19Dataset['recovered'].fillna(0)
+
+    # calculates current active cases of covid-19
+    completeCovid_19Dataset['active'] = completeCovid_19Dataset['confirmed'] - completeCovid_19Dataset['deaths'] - \
+                                        completeCovid_19Dataset['recovered']
+    return completeCovid_19Dataset
+
+
+# this function creates the per country and global totals datasets from the merged location dataset
+def aggregate_datasets(completeCovid_19Dataset):
+    # creates a backup dataset to be used in the call backs
+    backupDataSet = completeCovid_19Dataset
+
+    # creating 2 new sub data sets based on statistics around date and the country.
+    covid_19SubDataset_DCDRA = completeCovid_19Dataset.groupby(['date'])[
+        ['confirmed', 'deaths', 'recovered', 'active']].sum().reset_index()
+
+    completeCovid_19Dataset = completeCovid_19Dataset.groupby(['date', 'Country/Region'])[
+        ['confirmed', 'deaths', 'recovered', 'active']].sum().reset_index()
+
+    covid_19SubDataset_DCDRA['recovered'] = covid_19SubDataset_DCDRA['recovered'].astype('int32')
+
+    covid_19SubDataset_DCDRA['active'] = covid_19SubDataset_DCDRA['active'].astype('int32')
+
+    return completeCovid_19Dataset, backupDataSet, covid_19SubDataset_DCDRA
+
+
+# this function lines up the rows of a wide dataset with the confirmed locations, the same way the left merge of the
+# long datasets did, and returns its date values as an int32 (location, date) array. Locations that are missing from
+# the dataset are set to 0.
+def _aligned_values(locations, frame, dateColumns):
+    frame = frame.drop_duplicates(subset=locationColumns)
+    keys = frame[locationColumns].astype({'Lat': 'float32', 'Long': 'float32'})
+    keys['row'] = np.arange(len(frame))
+    rows = locations.merge(keys, how='left', on=locationColumns)['row'].to_numpy()
+
+    values = frame.reindex(columns=dateColumns, fill_value=0).to_numpy(dtype='int32')
+    aligned = np.zeros((len(locations), len(dateColumns)), dtype='int32')
+    found = ~np.isnan(rows)
+    aligned[found] = values[rows[found].astype('int64')]
+    return aligned
+
+
+# this function builds the dataset straight from the three wide data frames, without unpivoting them. Like the pipeline
+# above it is not used by the dashboard, it is the reference the arrays of ingest.ingest_covid_data are checked against
+# and is timed by the benchmarks.
+def build_covid_data(confirmed, deaths, recovered, version=None):
+    confirmed = confirmed.drop_duplicates(subset=locationColumns)
+    dateColumns = list(confirmed.columns[4:])
+    locations = confirmed[locationColumns].astype({'Lat': 'float32', 'Long': 'float32'}).reset_index(drop=True)
+
+    locationValues = np.empty((len(locations), len(dateColumns), len(metricNames)), dtype='int32')
+    locationValues[:, :, 0] = confirmed[dateColumns].to_numpy(dtype='int32')
+    locationValues[:, :, 1] = _aligned_values(locations, deaths, dateColumns)
+    locationValues[:, :, 2] = _aligned_values(locations, recovered, dateColumns)
+    locationValues[:, :, 3] = locationValues[:, :, 0] - locationValues[:, :, 1] - locationValues[:, :, 2]
+    return covid_data_from_locations(locations, dateColumns, locationValues, version=version)
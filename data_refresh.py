@@ -0,0 +1,157 @@
+# imports the libraries used to refresh the dataset in the background while the dashboard is running
+import logging
+import threading
+import time
+
+import numpy as np
+
+from data_cache import cache_key, save_dataset
+from ingest import ingest_covid_data
+from instrumentation import stage
+
+logger = logging.getLogger(__name__)
+
+
+# this class holds the dataset the callbacks read. A refreshed dataset is published by swapping a single reference,
+# so a callback that reads store.current once always works on one complete version of the data.
+class DataStore:
+
+    def __init__(self, covidData=None, loader=None):
+        self._current = covidData
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    # the current dataset, loaded by the loader the first time it is asked for
+    @property
+    def current(self):
+        if self._current is None and self._loader is not None:
+            with self._lock:
+                if self._current is None:
+                    self._current = self._loader()
+        return self._current
+
+    # whether the dataset has been loaded yet
+    @property
+    def loaded(self):
+        return self._current is not None
+
+    # this function sets the function used to load the dataset when it is first needed, dropping any loaded dataset
+    def set_loader(self, loader):
+        with self._lock:
+            self._loader = loader
+            self._current = None
+
+    # this function registers a function that is called with the new dataset every time one is published
+    def on_publish(self, listener):
+        self._listeners.append(listener)
+
+    # this function makes a new dataset visible to every callback
+    def publish(self, covidData):
+        with self._lock:
+            self._current = covidData
+        for listener in self._listeners:
+            listener(covidData)
+
+
+# this function returns the dataset to publish once the sources have been read into latest. When the dates the dataset
+# already holds are unchanged only the new dates are appended, so just their derived metrics and rankings are worked
+# out, and the dataset itself is returned when there are no new dates. When earlier dates were revised or the
+# locations changed latest is returned as it is, so what is published always matches the sources.
+@stage('append_new_dates')
+def append_new_dates(covidData, latest):
+    dayCount = len(covidData.dates)
+    if (len(latest.dates) < dayCount or not covidData.same_locations(latest)
+            or not np.array_equal(latest.dates[:dayCount], covidData.dates)
+            or not np.array_equal(latest.locationValues[:, :dayCount], covidData.locationValues)):
+        logger.info('earlier dates or locations changed, publishing the whole dataset')
+        return latest
+    if len(latest.dates) == dayCount:
+        return covidData
+    return covidData.extend(latest.dates_from(dayCount), version=latest.version)
+
+
+# this class calls refresh() every interval seconds on a background thread, the subclasses say what a refresh does
+class BackgroundRefresher:
+
+    # the name of the background thread and the message logged when a refresh fails
+    threadName = 'refresher'
+    failureMessage = 'refresh failed'
+
+    def __init__(self, store, interval):
+        self.store = store
+        self.interval = interval
+        self.lastRefreshDuration = None
+        self.lastRefreshTime = None
+        self._refreshLock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    # this function publishes a new dataset if there is one, returning whether it did
+    def refresh(self):
+        raise NotImplementedError
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception(self.failureMessage)
+
+    # this function starts refreshing on a background thread
+    def start(self):
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name=self.threadName, daemon=True)
+            self._thread.start()
+
+    # this function stops the background thread, waiting for a refresh that is running to finish
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+# this class refreshes the dataset of a store from its sources, either every interval seconds on a background thread
+# or when refresh() is called. Sources can be github, a local directory or any other url serving the csv files.
+class DataRefresher(BackgroundRefresher):
+
+    threadName = 'data-refresher'
+    failureMessage = 'dataset refresh failed'
+
+    def __init__(self, store, sources, cacheDir=None, interval=3600):
+        super().__init__(store, interval)
+        self.sources = sources
+        self.cacheDir = cacheDir
+        self._checkedKey = None
+
+    # this function checks the sources and publishes a new dataset if they have changed, returning whether it did.
+    # Nothing is done while the sources can not be reached.
+    def refresh(self):
+        with self._refreshLock:
+            started = time.perf_counter()
+            key = cache_key(self.sources)
+            if key is None:
+                logger.warning('the sources could not be reached, keeping the current dataset')
+                return False
+            current = self.store.current
+            if current is not None and key in (current.version, self._checkedKey):
+                return False
+
+            # the whole files are read, parsing a row costs the same however few of its dates are kept
+            refreshed = ingest_covid_data(self.sources, version=key)
+            if current is not None:
+                refreshed = append_new_dates(current, refreshed)
+            if refreshed is current:
+                # the files changed but there are no new dates to add yet
+                self._checkedKey = key
+                return False
+
+            if self.cacheDir:
+                save_dataset(self.cacheDir, key, refreshed)
+            self.store.publish(refreshed)
+            self.lastRefreshDuration = time.perf_counter() - started
+            self.lastRefreshTime = time.time()
+            logger.info('published dataset %s in %.2fs', key, self.lastRefreshDuration)
+            return True
@@ -0,0 +1,56 @@
+# imports the array library used to work out the derived metrics of every country at once
+import numpy as np
+
+from instrumentation import stage
+
+# the derived metrics worked out for every country, date and metric
+derivedNames = ['daily', 'rolling7', 'rolling14', 'pctChange', 'doublingTime']
+
+# the number of earlier days needed to work out the derived metrics of a new day
+historyDays = 14
+
+
+# this function works out the derived metrics from (country, date, metric) values in one pass over the whole array:
+#   daily          the change from the previous day
+#   rolling7/14    the average daily change over the last 7 or 14 days
+#   pctChange      the daily change as a percentage of the previous day's value
+#   doublingTime   the days the value would take to double at the growth rate of the last 7 days
+# Values that can not be worked out (e.g. a percentage of 0) are NaN. To work out only some new days, history holds
+# the values of up to historyDays days before them and offset is how many days of data come before them, so appended
+# days get exactly the same results as a full rebuild.
+@stage('derived')
+def compute_derived(values, history=None, offset=0):
+    countryCount, dayCount, metricCount = values.shape
+    if history is None:
+        history = values[:, :0]
+    history = history[:, max(0, history.shape[1] - historyDays):]
+
+    # days before the start of the data count as 0, which makes the first daily change the first value
+    padding = np.zeros((countryCount, historyDays - history.shape[1], metricCount))
+    series = np.concatenate([padding, history, values], axis=1).astype('float64')
+    current = series[:, historyDays:]
+
+    # this function returns the values from the given number of days earlier for every day in values
+    def lagged(days):
+        return series[:, historyDays - days:series.shape[1] - days]
+
+    # the number of days of data up to and including each day, so the first averages are over the days there are
+    dayNumber = (offset + np.arange(1, dayCount + 1))[None, :, None]
+    derived = {'daily': current - lagged(1),
+               'rolling7': (current - lagged(7)) / np.minimum(dayNumber, 7),
+               'rolling14': (current - lagged(14)) / np.minimum(dayNumber, 14)}
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        previous = lagged(1)
+        derived['pctChange'] = np.where(previous != 0, derived['daily'] / previous * 100, np.nan)
+        weekAgo = lagged(7)
+        growing = (dayNumber > 7) & (weekAgo > 0) & (current > weekAgo)
+        derived['doublingTime'] = np.where(growing, 7 * np.log(2) / np.log(current / weekAgo), np.nan)
+
+    return {name: derived[name].astype('float32') for name in derivedNames}
+
+
+# this function returns the derived metrics with the days of newValues appended, only working out the new days
+def extend_derived(derived, values, newValues):
+    appended = compute_derived(newValues, history=values[:, -historyDays:], offset=values.shape[1])
+    return {name: np.concatenate([derived[name], appended[name]], axis=1) for name in derivedNames}
@@ -0,0 +1,38 @@
+# imports the array library used to thin out the series drawn on the line chart
+import numpy as np
+
+# the default number of points drawn for each line of the line chart
+defaultMaxPoints = 500
+
+
+# this function returns the positions of the points of a series to draw so it has at most maxPoints points. The series
+# is split into equal buckets and the lowest and highest point of each bucket is kept along with the first and last
+# point, so every peak and trough of the full series is still drawn. Series with NaN values skip them in the buckets.
+def minmax_indices(values, maxPoints=defaultMaxPoints):
+    values = np.asarray(values, dtype='float64')
+    length = len(values)
+    bucketCount = (maxPoints - 2) // 2
+    if length <= maxPoints or bucketCount < 1:
+        return np.arange(length)
+
+    # the points between the first and last are padded to a whole number of buckets, the padding is never picked
+    inner = values[1:-1]
+    width = -(-len(inner) // bucketCount)
+    bucketCount = -(-len(inner) // width)
+    padding = bucketCount * width - len(inner)
+    lows = np.concatenate([np.where(np.isnan(inner), np.inf, inner), np.full(padding, np.inf)])
+    highs = np.concatenate([np.where(np.isnan(inner), -np.inf, inner), np.full(padding, -np.inf)])
+
+    starts = np.arange(bucketCount) * width + 1
+    lowest = starts + lows.reshape(bucketCount, width).argmin(axis=1)
+    highest = starts + highs.reshape(bucketCount, width).argmax(axis=1)
+    return np.unique(np.concatenate([[0], lowest, highest, [length - 1]]))
+
+
+# this function returns the positions of the points to draw for the days first to last, with one day either side so
+# the lines run to the edges of a zoomed in chart
+def window_indices(values, first=0, last=None, maxPoints=defaultMaxPoints):
+    last = len(values) - 1 if last is None else last
+    first = max(first - 1, 0)
+    last = min(last + 1, len(values) - 1)
+    return first + minmax_indices(values[first:last + 1], maxPoints)
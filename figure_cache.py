@@ -0,0 +1,81 @@
+# imports the libraries used to memoize the finished figures and statistics of the dashboard callbacks
+import threading
+import time
+from collections import OrderedDict
+
+from plotly.basedatatypes import BaseFigure
+
+
+# this function turns the lists and dictionaries dash passes to callbacks into tuples so they can be used as a key
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+
+# this class is a bounded least recently used cache with a time to live. Entries are keyed by the callback name, its
+# inputs and the version of the dataset, so a data refresh never serves figures made from the old data.
+class FigureCache:
+
+    def __init__(self, maxSize=256, ttl=3600):
+        self.maxSize = maxSize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    # this function returns whether the key is cached and its value, counting the hit or miss
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    # this function stores a value, evicting the least recently used entries when the cache is full
+    def set(self, key, value):
+        if self.maxSize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxSize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    # this function removes every entry, used when the dataset is refreshed
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # this function returns the counters used to size the cache
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'size': len(self._entries), 'maxSize': self.maxSize, 'ttl': self.ttl, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions,
+                    'hitRate': self.hits / lookups if lookups else 0.0}
+
+    # this function returns the output of a callback for its arguments, only calling it when the output is not cached.
+    # Plotly figures are stored as their finished json dictionaries so a cache hit skips both building and converting
+    # the figure. version is the version of the dataset the callback reads.
+    def fetch(self, name, version, function, args):
+        key = (name, version, _freeze(args))
+        found, value = self.get(key)
+        if found:
+            return value
+        value = function(*args)
+        if isinstance(value, BaseFigure):
+            value = value.to_dict()
+        self.set(key, value)
+        return value
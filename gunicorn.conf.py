@@ -0,0 +1,26 @@
+# gunicorn settings for running the dashboard with several workers sharing one dataset:
+#
+#   COVID_SHARED_DIR=/srv/covid-shared gunicorn Dashboard:server
+#
+# The master process publishes the dataset before the workers start, so each worker only memory maps the shared
+# files. Run `python shared_data.py $COVID_SHARED_DIR --watch` alongside it to publish new dates as they appear.
+import multiprocessing
+import os
+
+# the workers only share one copy of the dataset in shared mode, so one per cpu is only started then. Otherwise each
+# worker loads its own copy and gunicorn's default (WEB_CONCURRENCY or a single worker) is kept.
+if os.environ.get('COVID_SHARED_DIR'):
+    workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+
+
+# publishes the dataset once from the master process when the shared directory has nothing in it yet
+def on_starting(server):
+    sharedDir = os.environ.get('COVID_SHARED_DIR')
+    if not sharedDir:
+        return
+    from data_cache import load_covid_data
+    from data_prep import dataset_sources
+    from shared_data import publish_shared, shared_version
+    if shared_version(sharedDir) is None:
+        sources = dataset_sources(os.environ.get('COVID_DATA_DIR'))
+        publish_shared(sharedDir, load_covid_data(sources, sharedDir, keep=1))
@@ -0,0 +1,140 @@
+# this module reads the three wide csv files straight into the compact arrays of the dataset. Each file is streamed a
+# row at a time in a worker process of its own, so the three are parsed at the same time on a machine with several
+# cpus, and the counts of each row are parsed as int32 into a preallocated (location, date) array, with the Lat and
+# Long parsed as float32. The three arrays are then copied into the (location, date, metric) array of the dataset, so
+# the memory used on top of the finished dataset is at most one int32 array per file, instead of the float64/int64 long
+# frames and merge copies of the original preparation.
+#
+#   covidData = ingest_covid_data(dataset_sources())
+import csv
+import multiprocessing
+import os
+import shutil
+import tempfile
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from covid_data import covid_data_from_locations, locationColumns, metricNames
+from instrumentation import stage
+
+# the strings read as a missing value, the same ones pandas.read_csv reads as NaN
+naValues = {'', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN', '<NA>', 'N/A',
+            'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'}
+
+
+# this function returns the path of a local copy of a source, downloading it if it is a url
+def _local_source(source, workDir):
+    if not source.startswith(('http://', 'https://')):
+        return source
+    path = os.path.join(workDir, os.path.basename(source))
+    with urllib.request.urlopen(source, timeout=60) as response, open(path, 'wb') as localFile:
+        shutil.copyfileobj(response, localFile)
+    return path
+
+
+# this function returns the most rows a csv file can have, so its array can be allocated before it is read
+def _row_limit(path):
+    lines = 0
+    with open(path, 'rb') as csvFile:
+        for block in iter(lambda: csvFile.read(1 << 20), b''):
+            lines += block.count(b'\n')
+    return lines + 1
+
+
+# this function returns the date columns of a csv file and an iterator over its rows
+def _open_rows(csvFile):
+    rows = csv.reader(csvFile)
+    header = next(rows, [])
+    return header[4:], rows
+
+
+# this function returns the location of a row, with missing values as NaN and Lat and Long as float32 like pandas
+def _location(row):
+    province, country, lat, long = row[:4]
+    return (np.nan if province in naValues else province, np.nan if country in naValues else country,
+            np.float32(np.nan if lat in naValues else lat), np.float32(np.nan if long in naValues else long))
+
+
+# this function returns the location as a dictionary key, pandas merges match NaN with NaN so they are replaced by None
+def _location_key(location):
+    return tuple(None if pd.isna(value) else value for value in location)
+
+
+# this function returns the positions of the source's dates within the row and within the dataset's date columns
+def _date_positions(sourceDates, dateColumns):
+    datePositions = {date: position for position, date in enumerate(dateColumns)}
+    found = [(column, datePositions[date]) for column, date in enumerate(sourceDates) if date in datePositions]
+    return np.array([pair[0] for pair in found], dtype='int64'), np.array([pair[1] for pair in found], dtype='int64')
+
+
+# this function reads a csv file into a new int32 (location, date) array of the given date columns and returns it with
+# the locations of its rows. A location repeated in the file only uses its first row, like data_prep.build_covid_data.
+# It runs in a worker process of its own so the three files are parsed at the same time.
+def _read_source(path, dateColumns):
+    with open(path, newline='') as csvFile:
+        sourceDates, rows = _open_rows(csvFile)
+        sourceColumns, columns = _date_positions(sourceDates, dateColumns)
+
+        values = np.zeros((_row_limit(path), len(dateColumns)), dtype='int32')
+        locations, seen = [], set()
+        for row in rows:
+            if not row:
+                continue
+            location = _location(row)
+            key = _location_key(location)
+            if key in seen:
+                continue
+            seen.add(key)
+            values[len(locations), columns] = np.asarray(row[4:], dtype='int64')[sourceColumns]
+            locations.append(location)
+    return locations, values[:len(locations)]
+
+
+# this function returns the date columns of the csv file at path
+def _source_dates(path):
+    with open(path, newline='') as csvFile:
+        return _open_rows(csvFile)[0]
+
+
+# this function builds the dataset from the three sources, only reading the given date columns when dateColumns is set
+# (e.g. the new dates of a refresh) and every date of the confirmed source otherwise. Dates missing from the deaths or
+# recovered sources are 0, like the original left merge.
+@stage('ingest')
+def ingest_covid_data(sources, version=None, dateColumns=None):
+    metrics = ['confirmed', 'deaths', 'recovered']
+    with tempfile.TemporaryDirectory() as workDir:
+        with ThreadPoolExecutor(len(metrics)) as downloads:
+            paths = dict(zip(metrics, downloads.map(lambda metric: _local_source(sources[metric], workDir), metrics)))
+        dateColumns = list(_source_dates(paths['confirmed']) if dateColumns is None else dateColumns)
+        # with a single cpu the files are read one after another in this process, saving the copies between processes
+        readerCount = min(len(metrics), os.cpu_count() or 1)
+        # forking would copy the dashboard's threads and their locks into the readers, so they are started fresh
+        startMethod = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        with (ProcessPoolExecutor(readerCount, mp_context=multiprocessing.get_context(startMethod))
+              if readerCount > 1 else ThreadPoolExecutor(1)) as pool:
+            parsed = dict(zip(metrics, pool.map(_read_source, [paths[metric] for metric in metrics],
+                                                [dateColumns] * len(metrics))))
+
+    locations, confirmed = parsed.pop('confirmed')
+    locationValues = np.zeros((len(locations), len(dateColumns), len(metricNames)), dtype='int32')
+    locationValues[:, :, 0] = confirmed
+    del confirmed
+
+    # the deaths and recovered rows are lined up with the confirmed locations the same way the original left merge
+    # did, locations that are not in their file stay 0
+    rowOfLocation = {_location_key(location): row for row, location in enumerate(locations)}
+    for metric in ['deaths', 'recovered']:
+        sourceLocations, values = parsed.pop(metric)
+        targets = np.array([rowOfLocation.get(_location_key(location), -1) for location in sourceLocations],
+                           dtype='int64')
+        found = targets >= 0
+        locationValues[targets[found], :, metricNames.index(metric)] = values[found]
+        del values
+
+    np.subtract(locationValues[:, :, 0], locationValues[:, :, 1], out=locationValues[:, :, 3])
+    np.subtract(locationValues[:, :, 3], locationValues[:, :, 2], out=locationValues[:, :, 3])
+    locations = pd.DataFrame(locations, columns=locationColumns).astype({'Lat': 'float32', 'Long': 'float32'})
+    return covid_data_from_locations(locations, dateColumns, locationValues, version=version)
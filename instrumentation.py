@@ -0,0 +1,203 @@
+# this module records how long the callbacks, page loads and data preparation stages take and how large their output
+# is, and renders the results in the Prometheus text format for the /metrics route. Requests slower than a threshold
+# are logged, with a cProfile breakdown when profiling has been switched on.
+import cProfile
+import functools
+import io
+import logging
+import pstats
+import threading
+import time
+
+import flask
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# the histogram buckets for durations in seconds and output sizes in bytes
+secondBuckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+byteBuckets = (1e3, 1e4, 3e4, 1e5, 3e5, 1e6, 3e6, 1e7, 3e7, 1e8)
+
+# the most label combinations kept for a metric, later ones are counted under input="other" so a client sending many
+# different inputs can not grow the metrics without limit
+maxSeries = 500
+
+# the longest input label kept, longer labels are cut short
+maxInputLength = 80
+
+
+# this function escapes a label value for the Prometheus text format
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# this function renders a set of labels, e.g. {callback="update_stats",input="France"}
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(name, _escape(value)) for name, value in labels) + '}'
+
+
+# this class holds the histograms and gauges of the dashboard. Histograms are filled in as requests are served while
+# gauges are functions that are only called when the metrics are rendered.
+class Metrics:
+
+    def __init__(self):
+        self._histograms = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    # this function records a value in a histogram, labels is a dictionary such as {'callback': 'update_stats'}
+    def observe(self, name, value, labels=None, buckets=secondBuckets, description=''):
+        labels = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            histogram = self._histograms.setdefault(name, {'description': description, 'buckets': buckets,
+                                                           'series': {}})
+            series = histogram['series']
+            if labels not in series and len(series) >= maxSeries:
+                labels = tuple((label, 'other' if label == 'input' else labelValue) for label, labelValue in labels)
+            counts = series.setdefault(labels, {'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0})
+            for position, bound in enumerate(buckets):
+                if value <= bound:
+                    counts['buckets'][position] += 1
+            counts['sum'] += value
+            counts['count'] += 1
+
+    # this function adds a gauge or counter, read is called when the metrics are rendered and returns a number or a
+    # list of (labels, number) pairs
+    def gauge(self, name, read, description='', kind='gauge'):
+        with self._lock:
+            self._gauges[name] = (read, description, kind)
+
+    # this function returns every metric in the Prometheus text format
+    def render(self):
+        lines = []
+        with self._lock:
+            histograms = {name: dict(histogram, series=dict(histogram['series']))
+                          for name, histogram in self._histograms.items()}
+            gauges = dict(self._gauges)
+
+        for name, histogram in sorted(histograms.items()):
+            lines += ['# HELP {} {}'.format(name, histogram['description']), '# TYPE {} histogram'.format(name)]
+            for labels, counts in sorted(histogram['series'].items()):
+                for bound, count in zip(histogram['buckets'], counts['buckets']):
+                    lines.append('{}_bucket{} {}'.format(name, _labels(labels + (('le', repr(float(bound))),)), count))
+                lines.append('{}_bucket{} {}'.format(name, _labels(labels + (('le', '+Inf'),)), counts['count']))
+                lines.append('{}_sum{} {}'.format(name, _labels(labels), repr(counts['sum'])))
+                lines.append('{}_count{} {}'.format(name, _labels(labels), counts['count']))
+
+        for name, (read, description, kind) in sorted(gauges.items()):
+            try:
+                values = read()
+            except Exception:
+                logger.exception('reading the %s metric failed', name)
+                continue
+            if values is None:
+                continue
+            lines += ['# HELP {} {}'.format(name, description), '# TYPE {} {}'.format(name, kind)]
+            for labels, value in (values if isinstance(values, list) else [((), values)]):
+                lines.append('{}{} {}'.format(name, _labels(tuple(sorted(dict(labels).items()))), repr(float(value))))
+        return ''.join(line + '\n' for line in lines)
+
+
+# the metrics of this process, with several workers each one reports its own
+metrics = Metrics()
+
+
+# this function returns the size in bytes of the output of a preparation stage
+def _output_bytes(output):
+    if isinstance(output, np.ndarray):
+        return output.nbytes
+    if isinstance(output, dict):
+        return sum(_output_bytes(value) for value in output.values())
+    return getattr(output, 'nbytes', 0)
+
+
+# this function returns a decorator that records the time a preparation stage takes and the size of what it returns
+def stage(name):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            output = function(*args, **kwargs)
+            metrics.observe('covid_prep_stage_seconds', time.perf_counter() - started, {'stage': name},
+                            description='Time taken by each data preparation stage')
+            if output is not None:
+                metrics.observe('covid_prep_stage_bytes', _output_bytes(output), {'stage': name}, buckets=byteBuckets,
+                                description='Size of the arrays returned by each data preparation stage')
+            return output
+
+        return wrapper
+
+    return decorator
+
+
+# this function returns the input label of a callback request, made from its text and number inputs (e.g. the
+# selected country and view) so the metrics can be broken down by them. Dictionaries such as relayoutData are left out.
+def _input_label(inputs):
+    values = []
+    for item in inputs or []:
+        value = item.get('value') if isinstance(item, dict) else None
+        if isinstance(value, list):
+            value = ','.join(str(entry) for entry in value if isinstance(entry, (str, int, float)))
+        if isinstance(value, (str, int, float)) and not isinstance(value, bool):
+            values.append(str(value))
+    return '|'.join(values)[:maxInputLength]
+
+
+# this class times every callback and page load of a dash app and records the size of each response, logging the
+# requests slower than slowSeconds. When profiling is switched on every request is run under cProfile and the slowest
+# functions of the slow requests are logged.
+class RequestInstrumentation:
+
+    def __init__(self, app, slowSeconds=1.0, profiling=False):
+        self.app = app
+        self.slowSeconds = slowSeconds
+        self.profiling = profiling
+        app.server.before_request(self._before)
+        app.server.after_request(self._after)
+
+    # this function returns the name a request is recorded under and its input label, or None for static files
+    def _request_name(self):
+        path = flask.request.path
+        if path.endswith('/_dash-update-component'):
+            body = flask.request.get_json(silent=True) or {}
+            output = body.get('output', '')
+            function = self.app.callback_map.get(output, {}).get('callback')
+            return getattr(function, '__name__', output), _input_label(body.get('inputs'))
+        if path.endswith('/_dash-layout'):
+            return 'serve_layout', ''
+        if path == self.app.config.requests_pathname_prefix:
+            return 'index', ''
+        return None
+
+    def _before(self):
+        flask.g.instrumentationStarted = time.perf_counter()
+        if self.profiling:
+            flask.g.profiler = cProfile.Profile()
+            flask.g.profiler.enable()
+
+    def _after(self, response):
+        profiler = flask.g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+        started = flask.g.pop('instrumentationStarted', None)
+        request = self._request_name() if started is not None else None
+        if request is None:
+            return response
+
+        seconds = time.perf_counter() - started
+        size = len(response.get_data()) if not response.direct_passthrough else response.content_length or 0
+        labels = {'callback': request[0], 'input': request[1]}
+        metrics.observe('covid_callback_duration_seconds', seconds, labels,
+                        description='Time taken to answer each callback and page load, by input')
+        metrics.observe('covid_callback_payload_bytes', size, labels, buckets=byteBuckets,
+                        description='Size of the json sent back for each callback and page load, by input')
+
+        if seconds > self.slowSeconds:
+            logger.warning('slow request %s (%s) took %.3fs and sent %d bytes', request[0], request[1], seconds, size)
+            if profiler is not None:
+                report = io.StringIO()
+                pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(25)
+                logger.warning('profile of %s (%s):\n%s', request[0], request[1], report.getvalue())
+        return response
@@ -0,0 +1,46 @@
+# imports the array library used to rank the countries by each metric
+import numpy as np
+
+from instrumentation import stage
+
+
+# this function works out the order of the countries on every date for every metric, highest value first, as an int32
+# (date, metric, country) array. Countries with the same value keep their alphabetical order.
+@stage('rankings')
+def compute_rankings(values):
+    order = np.argsort(-values.astype('int64'), axis=0, kind='stable')
+    return np.ascontiguousarray(order.transpose(1, 2, 0)).astype('int32')
+
+
+# this function returns the rankings with the dates of newValues appended, each date is ranked on its own so only the
+# new dates are worked out
+def extend_rankings(rankings, newValues):
+    return np.concatenate([rankings, compute_rankings(newValues)])
+
+
+# this function returns the positions and values of the count countries with the highest value of a metric on a date,
+# read straight from the precomputed rankings
+def top_on_date(covidData, metric, dateIndex, count):
+    metricIndex = covidData.metricIndex[metric]
+    countries = covidData.rankings[dateIndex, metricIndex, :count]
+    return countries, covidData.values[countries, dateIndex, metricIndex].astype('int64')
+
+
+# this function returns the positions and values of the count countries with the largest change in a metric from the
+# day before first to last, i.e. the new cases over the range. Only the count largest are sorted.
+def top_over_range(covidData, metric, first, last, count):
+    metricIndex = covidData.metricIndex[metric]
+    change = covidData.values[:, last, metricIndex].astype('int64')
+    if first > 0:
+        change -= covidData.values[:, first - 1, metricIndex]
+    if count < len(change):
+        # the changes above the count-th largest are all kept, and as many of the countries equal to it as there is
+        # room for
+        threshold = change[np.argpartition(-change, count - 1)[count - 1]]
+        above = np.flatnonzero(change > threshold)
+        candidates = np.concatenate([above, np.flatnonzero(change == threshold)[:count - len(above)]])
+    else:
+        candidates = np.arange(len(change))
+    # sorted highest first, countries with the same change in alphabetical order like the rankings
+    countries = candidates[np.lexsort((candidates, -change[candidates]))]
+    return countries, change[countries]
@@ -0,0 +1,109 @@
+# this module shares one prepared dataset between several server workers. A single loader process writes the arrays
+# to a directory of numpy files and points a version file at them, and every worker memory maps those files read only,
+# so the operating system keeps a single copy of the data in memory however many workers are running.
+#
+#   python shared_data.py /srv/covid-shared            publishes the dataset once
+#   python shared_data.py /srv/covid-shared --watch    keeps publishing new dates as they appear
+#
+# The workers are started with COVID_SHARED_DIR=/srv/covid-shared.
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+from data_cache import load_covid_data, load_dataset, save_dataset
+from data_prep import dataset_sources
+from data_refresh import BackgroundRefresher, DataRefresher, DataStore
+
+logger = logging.getLogger(__name__)
+
+# the name of the file holding the version the workers should use
+pointerFile = '.current'
+
+
+# this function writes a dataset to the shared directory and then points the version file at it. The previous version
+# is kept so workers that are still reading it are not affected.
+def publish_shared(sharedDir, covidData):
+    version = covidData.version or 'v{}'.format(time.time_ns())
+    save_dataset(sharedDir, version, covidData, keep=1)
+    handle, workFile = tempfile.mkstemp(dir=sharedDir, prefix='.tmp-')
+    with os.fdopen(handle, 'w') as pointer:
+        pointer.write(version)
+    # the pointer has to be readable by every worker, not just the user that published it
+    os.chmod(workFile, 0o644)
+    os.replace(workFile, os.path.join(sharedDir, pointerFile))
+    return version
+
+
+# this function returns the version the shared directory currently points at, or None if nothing has been published
+def shared_version(sharedDir):
+    try:
+        with open(os.path.join(sharedDir, pointerFile)) as pointer:
+            return pointer.read().strip() or None
+    except OSError:
+        return None
+
+
+# this function attaches to the current shared dataset with its arrays memory mapped read only
+def attach_shared(sharedDir):
+    version = shared_version(sharedDir)
+    covidData = load_dataset(sharedDir, version, mmapMode='r') if version else None
+    if covidData is None:
+        raise FileNotFoundError('no dataset has been published to {}'.format(sharedDir))
+    return covidData
+
+
+# this class is used by the workers in place of the DataRefresher. It checks the version file every interval seconds
+# (or when refresh() is called) and attaches the store to a newly published version.
+class SharedDataFollower(BackgroundRefresher):
+
+    threadName = 'shared-data-follower'
+    failureMessage = 'attaching to the shared dataset failed'
+
+    def __init__(self, store, sharedDir, interval=10):
+        super().__init__(store, interval)
+        self.sharedDir = sharedDir
+
+    # this function attaches to the published version if it is newer than the one in the store, returning whether it did
+    def refresh(self):
+        with self._refreshLock:
+            started = time.perf_counter()
+            version = shared_version(self.sharedDir)
+            if version is None or (self.store.loaded and self.store.current.version == version):
+                return False
+            covidData = load_dataset(self.sharedDir, version, mmapMode='r')
+            if covidData is None:
+                # the version was removed or is not complete, the store keeps the dataset it has
+                logger.warning('shared dataset %s could not be loaded', version)
+                return False
+            self.store.publish(covidData)
+            self.lastRefreshDuration = time.perf_counter() - started
+            self.lastRefreshTime = time.time()
+            logger.info('attached to shared dataset %s', version)
+            return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Publishes the prepared dataset for the dashboard workers to share')
+    parser.add_argument('sharedDir', help='directory the workers read the dataset from (COVID_SHARED_DIR)')
+    parser.add_argument('--data-dir', default=os.environ.get('COVID_DATA_DIR'),
+                        help='local directory or url of the csv files, github is used by default')
+    parser.add_argument('--watch', action='store_true', help='keep checking the sources and publish new dates')
+    parser.add_argument('--interval', type=float, default=3600, help='seconds between checks when watching')
+    arguments = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    sources = dataset_sources(arguments.data_dir)
+    # the version .current points to is kept until the pointer has moved, as workers may have it mapped
+    store = DataStore(load_covid_data(sources, arguments.sharedDir, keep=1))
+    logger.info('published dataset %s', publish_shared(arguments.sharedDir, store.current))
+    if arguments.watch:
+        store.on_publish(lambda covidData: publish_shared(arguments.sharedDir, covidData))
+        refresher = DataRefresher(store, sources, interval=arguments.interval)
+        while True:
+            time.sleep(arguments.interval)
+            try:
+                refresher.refresh()
+            except Exception:
+                logger.exception('dataset refresh failed')
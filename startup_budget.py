@@ -0,0 +1,59 @@
+# this script measures how long the dashboard takes to import and to answer its first requests, and fails when either
+# is over budget. Each measurement runs in a new python process so nothing is already imported or loaded.
+#
+#   python startup_budget.py --import-budget 3 --first-response-budget 2
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# the code run in the new process, it prints the timings as json
+measureScript = '''
+import json, time
+started = time.perf_counter()
+import Dashboard
+imported = time.perf_counter()
+loadedOnImport = Dashboard.app_state(Dashboard.app).store.loaded
+client = Dashboard.server.test_client()
+index = client.get('/')
+indexed = time.perf_counter()
+layout = client.get('/_dash-layout')
+laidOut = time.perf_counter()
+print(json.dumps({'import': imported - started,
+                  'firstResponse': indexed - imported,
+                  'firstLayout': laidOut - indexed,
+                  'indexBytes': len(index.data),
+                  'layoutBytes': len(layout.data),
+                  'dataLoadedOnImport': loadedOnImport}))
+'''
+
+
+# this function runs the measurement in a new python process and returns the timings
+def measure():
+    output = subprocess.run([sys.executable, '-c', measureScript], check=True, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Checks the import time and time to first response of the dashboard')
+    parser.add_argument('--import-budget', type=float, default=3.0, help='seconds allowed to import Dashboard')
+    parser.add_argument('--first-response-budget', type=float, default=2.0,
+                        help='seconds allowed for the first page and layout requests')
+    arguments = parser.parse_args()
+
+    timings = measure()
+    print(json.dumps(timings, indent=2))
+    failures = []
+    if timings['import'] > arguments.import_budget:
+        failures.append('import took {:.2f}s (budget {:.2f}s)'.format(timings['import'], arguments.import_budget))
+    firstResponse = timings['firstResponse'] + timings['firstLayout']
+    if firstResponse > arguments.first_response_budget:
+        failures.append('first response took {:.2f}s (budget {:.2f}s)'.format(firstResponse,
+                                                                               arguments.first_response_budget))
+    if timings['dataLoadedOnImport']:
+        failures.append('the dataset was loaded while importing Dashboard')
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
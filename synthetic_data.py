@@ -0,0 +1,87 @@
+# this script writes synthetic datasets in the same wide layout as the John Hopkins University
+# time_series_covid19_{confirmed,deaths,recovered}_global.csv files, with any number of locations and days, so the
+# dashboard can be run and benchmarked offline and at larger sizes than the real data.
+#
+#   python synthetic_data.py ./synthetic --locations 2890 --days 11430
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_prep import datasetFiles
+
+# roughly the size of the real datasets, 289 locations over 1143 days
+defaultLocations = 289
+defaultDays = 1143
+
+# countries that are always generated so the dashboard's default dropdown values exist
+fixedCountries = ['United Kingdom', 'France', 'US', 'Italy', 'Germany', 'Canada']
+
+
+# this function returns the location columns, several countries are split into provinces like the real data
+def _locations(locationCount, random):
+    countryCount = max(len(fixedCountries), int(locationCount * 0.7))
+    countries = fixedCountries + ['Country {:04d}'.format(number)
+                                  for number in range(countryCount - len(fixedCountries))]
+    countries = countries[:locationCount]
+    # every country gets one location, the rest are provinces of randomly picked countries
+    extra = random.choice(len(countries), size=locationCount - len(countries))
+    countryOfLocation = np.concatenate([np.arange(len(countries)), np.sort(extra)])
+    provinces = np.full(locationCount, np.nan, dtype=object)
+    provinceCounts = {}
+    for position in range(len(countries), locationCount):
+        country = countryOfLocation[position]
+        provinceCounts[country] = provinceCounts.get(country, 0) + 1
+        provinces[position] = 'Province {} of {}'.format(provinceCounts[country], countries[country])
+    return pd.DataFrame({'Province/State': provinces,
+                         'Country/Region': np.array(countries, dtype=object)[countryOfLocation],
+                         'Lat': np.round(random.uniform(-60, 70, locationCount), 4),
+                         'Long': np.round(random.uniform(-180, 180, locationCount), 4)})
+
+
+# this function returns cumulative case counts that grow in waves, shape (location, day)
+def _cumulative_cases(locationCount, dayCount, random):
+    days = np.arange(dayCount)
+    size = random.lognormal(mean=5, sigma=1.5, size=(locationCount, 1))
+    waves = np.zeros((locationCount, dayCount))
+    for _ in range(4):
+        peak = random.uniform(0, dayCount, size=(locationCount, 1))
+        width = random.uniform(20, 90, size=(locationCount, 1))
+        waves += np.exp(-((days - peak) / width) ** 2)
+    daily = random.poisson(size * waves)
+    return np.cumsum(daily, axis=1).astype('int64')
+
+
+# this function writes the three csv files to the output directory and returns their paths
+def generate_datasets(outputDir, locations=defaultLocations, days=defaultDays, seed=0):
+    random = np.random.default_rng(seed)
+    os.makedirs(outputDir, exist_ok=True)
+    locationFrame = _locations(locations, random)
+    dates = pd.date_range('2020-01-22', periods=days)
+    # the csv files use dates like 1/22/20
+    dateColumns = ['{}/{}/{}'.format(date.month, date.day, date.strftime('%y')) for date in dates]
+
+    confirmed = _cumulative_cases(locations, days, random)
+    deaths = (confirmed * random.uniform(0.005, 0.03, size=(locations, 1))).astype('int64')
+    recovered = (confirmed * random.uniform(0.6, 0.95, size=(locations, 1))).astype('int64')
+    # recoveries stopped being reported part way through, like the real data
+    recovered[:, int(days * 0.6):] = 0
+
+    paths = {}
+    for metric, values in [('confirmed', confirmed), ('deaths', deaths), ('recovered', recovered)]:
+        frame = pd.concat([locationFrame, pd.DataFrame(values, columns=dateColumns)], axis=1)
+        paths[metric] = os.path.join(outputDir, datasetFiles[metric])
+        frame.to_csv(paths[metric], index=False)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Writes synthetic datasets in the John Hopkins University layout')
+    parser.add_argument('outputDir', help='directory the three csv files are written to')
+    parser.add_argument('--locations', type=int, default=defaultLocations, help='number of locations (rows)')
+    parser.add_argument('--days', type=int, default=defaultDays, help='number of days (date columns)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random numbers')
+    arguments = parser.parse_args()
+    for path in generate_datasets(arguments.outputDir, arguments.locations, arguments.days, arguments.seed).values():
+        print(path)
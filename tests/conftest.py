@@ -0,0 +1,27 @@
+# the dashboard's modules sit at the top of the repository, so it is put on the path for the tests to import them
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    import Dashboard
+    from synthetic_data import generate_datasets
+    apps = []
+
+    # this function creates an app on its own synthetic data, the apps are closed at the end of the test
+    def make(name, days, **config):
+        dataDir = tmp_path / name
+        generate_datasets(str(dataDir), locations=20, days=days)
+        app = Dashboard.create_app(dict({'dataDir': str(dataDir), 'cacheDir': str(tmp_path / (name + '-cache')),
+                                         'sharedDir': None, 'refreshInterval': 0}, **config))
+        apps.append(app)
+        return app
+
+    yield make
+    for app in apps:
+        Dashboard.close_app(app)
@@ -0,0 +1,57 @@
+# checks every app made by Dashboard.create_app works on its own dataset, settings, figure cache and refresher
+import Dashboard
+from synthetic_data import generate_datasets
+
+
+def test_apps_keep_their_own_state(make_app):
+    first = make_app('first', 40, lineChartMaxPoints=10, figureCacheSize=5)
+    second = make_app('second', 50, adminToken='secret')
+
+    assert Dashboard.app_state(first) is not Dashboard.app_state(second)
+    assert Dashboard.app_state(first).figureCache.maxSize == 5
+    for app, days in [(first, 40), (second, 50)]:
+        with app.server.app_context():
+            assert len(Dashboard.current_data().dates) == days
+            Dashboard.update_stats('France')
+        assert Dashboard.app_state(app).figureCache.stats()['size'] == 1
+
+    # only the app with a token serves the admin routes
+    assert first.server.test_client().post('/_refresh').status_code == 405
+    assert second.server.test_client().post('/_refresh').status_code == 403
+
+
+def test_metrics_report_the_app_gauges(make_app):
+    first = make_app('first', 40)
+    second = make_app('second', 50)
+    with second.server.app_context():
+        Dashboard.current_data()
+
+    firstMetrics = first.server.test_client().get('/metrics').get_data(as_text=True)
+    secondMetrics = second.server.test_client().get('/metrics').get_data(as_text=True)
+    # the first request builds the layout, loading the dataset of the app it was sent to
+    assert 'covid_data_dates 40.0' in firstMetrics
+    assert 'covid_data_dates 50.0' in secondMetrics
+
+
+def test_closing_an_app_stops_its_refresher(make_app):
+    app = make_app('first', 40, refreshInterval=3600)
+    refresher = Dashboard.app_state(app).refresher
+    assert refresher._thread.is_alive()
+
+    thread = refresher._thread
+    Dashboard.close_app(app)
+    assert not thread.is_alive()
+    assert refresher._thread is None
+
+
+def test_refresh_route_publishes_to_its_own_app(make_app, tmp_path):
+    first = make_app('first', 40)
+    second = make_app('second', 40, adminToken='secret')
+    for app in [first, second]:
+        Dashboard.app_state(app).store.current
+    generate_datasets(str(tmp_path / 'second'), locations=20, days=42)
+
+    response = second.server.test_client().post('/_refresh', headers={'Authorization': 'Bearer secret'})
+    assert response.get_json()['refreshed']
+    assert len(Dashboard.app_state(second).store.current.dates) == 42
+    assert len(Dashboard.app_state(first).store.current.dates) == 40
@@ -0,0 +1,72 @@
+# checks the prepared dataset is read back from the cache while the sources are unchanged, rebuilt when they change and
+# still loaded from the cache when the sources can not be reached
+import os
+
+import numpy as np
+import pytest
+
+import data_cache
+import data_prep
+from data_cache import cache_key, load_covid_data, load_dataset, save_dataset
+from ingest import ingest_covid_data
+from synthetic_data import generate_datasets
+
+
+@pytest.fixture
+def syntheticSources(tmp_path):
+    generate_datasets(str(tmp_path / 'data'), locations=20, days=40)
+    return data_prep.dataset_sources(str(tmp_path / 'data'))
+
+
+# this function makes any further csv read fail the test, so a dataset can only come from the cache
+def forbid_ingest(monkeypatch):
+    def ingest(*args, **kwargs):
+        raise AssertionError('the csv files were read again')
+    monkeypatch.setattr(data_cache, 'ingest_covid_data', ingest)
+
+
+def test_unchanged_sources_are_read_from_the_cache(tmp_path, syntheticSources, monkeypatch):
+    cacheDir = str(tmp_path / 'cache')
+    covidData = load_covid_data(syntheticSources, cacheDir)
+    assert os.listdir(cacheDir) == [covidData.version]
+
+    forbid_ingest(monkeypatch)
+    cached = load_covid_data(syntheticSources, cacheDir)
+    assert cached.version == covidData.version
+    np.testing.assert_array_equal(cached.values, covidData.values)
+    np.testing.assert_array_equal(cached.countries, covidData.countries)
+
+
+def test_changed_sources_rebuild_the_cache(tmp_path, syntheticSources):
+    cacheDir = str(tmp_path / 'cache')
+    oldVersion = load_covid_data(syntheticSources, cacheDir).version
+    generate_datasets(str(tmp_path / 'data'), locations=20, days=45)
+
+    covidData = load_covid_data(syntheticSources, cacheDir)
+    assert covidData.version == cache_key(syntheticSources) != oldVersion
+    assert len(covidData.dates) == 45
+    np.testing.assert_array_equal(covidData.values, ingest_covid_data(syntheticSources).values)
+    # the old entry is removed as no other readers are kept
+    assert os.listdir(cacheDir) == [covidData.version]
+
+
+def test_unreachable_sources_use_the_newest_cache(tmp_path, syntheticSources, monkeypatch):
+    cacheDir = str(tmp_path / 'cache')
+    covidData = load_covid_data(syntheticSources, cacheDir)
+    os.remove(syntheticSources['deaths'])
+    assert cache_key(syntheticSources) is None
+
+    forbid_ingest(monkeypatch)
+    cached = load_covid_data(syntheticSources, cacheDir)
+    assert cached.version == covidData.version
+    np.testing.assert_array_equal(cached.values, covidData.values)
+
+
+def test_saving_a_key_another_process_saved_keeps_its_copy(tmp_path, syntheticSources):
+    cacheDir = str(tmp_path / 'cache')
+    covidData = ingest_covid_data(syntheticSources)
+    save_dataset(cacheDir, 'key', covidData)
+    save_dataset(cacheDir, 'key', covidData)
+
+    assert os.listdir(cacheDir) == ['key']
+    np.testing.assert_array_equal(load_dataset(cacheDir, 'key').values, covidData.values)
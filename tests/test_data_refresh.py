@@ -0,0 +1,76 @@
+# checks the data refresher publishes what a fresh read of its sources gives, whether only new dates were added or
+# earlier dates were revised, and leaves the dataset alone when it can not reach them
+import os
+
+import numpy as np
+import pandas as pd
+
+import data_prep
+from data_cache import load_dataset
+from data_refresh import DataRefresher, DataStore
+from derived_metrics import derivedNames
+from ingest import ingest_covid_data
+from synthetic_data import generate_datasets
+
+
+# this function checks two datasets hold the same dates, values, derived metrics and rankings
+def assert_same_dataset(covidData, expected):
+    np.testing.assert_array_equal(covidData.dates, expected.dates)
+    np.testing.assert_array_equal(covidData.values, expected.values)
+    np.testing.assert_array_equal(covidData.locationValues, expected.locationValues)
+    np.testing.assert_array_equal(covidData.globalValues, expected.globalValues)
+    for name in derivedNames:
+        np.testing.assert_array_equal(covidData.derived[name], expected.derived[name], err_msg=name)
+    np.testing.assert_array_equal(covidData.rankings, expected.rankings)
+
+
+# this function rewrites the csv files of a directory keeping only their first dayCount dates
+def truncate_sources(sources, dayCount):
+    for source in sources.values():
+        frame = pd.read_csv(source)
+        frame.iloc[:, :4 + dayCount].to_csv(source, index=False)
+
+
+def test_new_dates_are_appended(tmp_path):
+    generate_datasets(str(tmp_path), locations=20, days=45)
+    sources = data_prep.dataset_sources(str(tmp_path))
+    fullFiles = {metric: open(source).read() for metric, source in sources.items()}
+    truncate_sources(sources, 40)
+    store = DataStore(ingest_covid_data(sources))
+    # the derived metrics and rankings are worked out so the refresh only extends them
+    store.current.derived, store.current.rankings
+    for metric, source in sources.items():
+        with open(source, 'w') as csvFile:
+            csvFile.write(fullFiles[metric])
+
+    refresher = DataRefresher(store, sources, cacheDir=str(tmp_path / 'cache'), interval=0)
+    assert refresher.refresh()
+    assert_same_dataset(store.current, ingest_covid_data(sources))
+    assert_same_dataset(load_dataset(str(tmp_path / 'cache'), store.current.version), store.current)
+    assert not refresher.refresh()
+
+
+def test_revised_dates_replace_the_dataset(tmp_path):
+    generate_datasets(str(tmp_path), locations=20, days=40)
+    sources = data_prep.dataset_sources(str(tmp_path))
+    store = DataStore(ingest_covid_data(sources))
+    store.current.derived, store.current.rankings
+    # a different length changes every value of the synthetic data, like a revision of the earlier dates
+    generate_datasets(str(tmp_path), locations=20, days=45)
+
+    refresher = DataRefresher(store, sources, cacheDir=str(tmp_path / 'cache'), interval=0)
+    assert refresher.refresh()
+    assert_same_dataset(store.current, ingest_covid_data(sources))
+    # the cache entry saved under the sources' key matches the files
+    assert_same_dataset(load_dataset(str(tmp_path / 'cache'), store.current.version), ingest_covid_data(sources))
+
+
+def test_unreachable_sources_keep_the_dataset(tmp_path):
+    generate_datasets(str(tmp_path), locations=20, days=40)
+    sources = data_prep.dataset_sources(str(tmp_path))
+    covidData = ingest_covid_data(sources)
+    store = DataStore(covidData)
+    os.remove(sources['deaths'])
+
+    assert not DataRefresher(store, sources, interval=0).refresh()
+    assert store.current is covidData
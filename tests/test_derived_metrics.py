@@ -0,0 +1,58 @@
+# checks the derived metrics of appended days are exactly the ones a full rebuild gives, including the values that
+# can not be worked out and are shown as N/A
+import numpy as np
+import pytest
+
+import data_prep
+from derived_metrics import compute_derived, derivedNames, extend_derived
+from ingest import ingest_covid_data
+from synthetic_data import generate_datasets
+
+
+# this function returns (country, date, metric) counts with runs of zeros, falls and repeated values, so every path of
+# the percentage change and doubling time is taken
+def awkward_values(dayCount=60):
+    random = np.random.default_rng(0)
+    values = np.cumsum(random.integers(-3, 6, size=(8, dayCount, 4)), axis=1)
+    values[0] = 0
+    values[1, :20] = 0
+    values[2, 10:30] = values[2, 10:11]
+    values[3, 25:] = 0
+    return values.astype('int32')
+
+
+@pytest.mark.parametrize('split', [1, 3, 7, 14, 15, 40, 59])
+def test_appended_days_match_a_full_rebuild(split):
+    values = awkward_values()
+    expected = compute_derived(values)
+    extended = extend_derived(compute_derived(values[:, :split]), values[:, :split], values[:, split:])
+    for name in derivedNames:
+        np.testing.assert_array_equal(extended[name], expected[name], err_msg=name)
+
+
+def test_values_that_can_not_be_worked_out_are_nan():
+    values = awkward_values()
+    derived = compute_derived(values)
+    # a change on a previous day of 0 has no percentage, and nothing doubles from 0 or while it is not growing
+    assert np.isnan(derived['pctChange'][0]).all()
+    assert np.isnan(derived['pctChange'][1, 1:20]).all()
+    assert np.isnan(derived['doublingTime'][0]).all()
+    assert np.isnan(derived['doublingTime'][2, 17:30]).all()
+    assert np.isnan(derived['doublingTime'][:, :7]).all()
+    assert np.isnan(derived['doublingTime'][3, 26:]).all()
+    assert not np.isnan(derived['daily']).any()
+
+
+def test_extended_dataset_matches_a_full_rebuild(tmp_path):
+    generate_datasets(str(tmp_path), locations=30, days=90)
+    sources = data_prep.dataset_sources(str(tmp_path))
+    covidData = ingest_covid_data(sources)
+    dateColumns = ['{}/{}/{}'.format(date.month, date.day, date.strftime('%y')) for date in
+                   covidData.dates[:80].astype('datetime64[D]').tolist()]
+    earlier = ingest_covid_data(sources, dateColumns=dateColumns)
+    earlier.derived
+
+    extended = earlier.extend(covidData.dates_from(80))
+    expected = compute_derived(covidData.values)
+    for name in derivedNames:
+        np.testing.assert_array_equal(extended.derived[name], expected[name], err_msg=name)
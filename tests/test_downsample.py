@@ -0,0 +1,123 @@
+# checks the line chart downsampling keeps at most maxPoints points of a series while every peak and trough is still
+# drawn, and that zooming the line chart redraws just the visible dates in more detail
+import numpy as np
+import pandas as pd
+import pytest
+
+import Dashboard
+from downsample import minmax_indices, window_indices
+
+
+# this function checks the points kept from values start to end (inclusive): there are at most maxPoints, they are
+# sorted without repeats, both ends are kept and every point lies between the lowest and highest kept point near it.
+# A bucket is never wider than the interior points shared between the buckets, so each point's bucket, whose lowest
+# and highest points are kept, lies within that distance of it.
+def assert_envelope(values, keep, maxPoints, start=0, end=None):
+    end = len(values) - 1 if end is None else end
+    assert len(keep) <= maxPoints
+    assert np.all(np.diff(keep) > 0)
+    assert keep[0] == start and keep[-1] == end
+
+    length = end - start + 1
+    if length <= maxPoints:
+        assert list(keep) == list(range(start, end + 1))
+        return
+    reach = -(-length // ((maxPoints - 2) // 2))
+    kept = np.full(len(values), np.nan)
+    kept[keep] = values[keep]
+    for position in range(start, end + 1):
+        if np.isnan(values[position]):
+            continue
+        near = kept[max(position - reach, start):position + reach + 1]
+        assert np.nanmin(near) <= values[position] <= np.nanmax(near), position
+
+
+@pytest.mark.parametrize('length', [1, 2, 7, 8, 9, 100, 1143, 5000])
+@pytest.mark.parametrize('maxPoints', [4, 7, 50, 500])
+def test_random_walks_keep_their_envelope(length, maxPoints):
+    values = np.cumsum(np.random.default_rng(length * maxPoints).normal(size=length))
+    assert_envelope(values, minmax_indices(values, maxPoints), maxPoints)
+
+
+def test_spikes_are_always_kept():
+    values = np.zeros(5000)
+    spikes = [1, 777, 2500, 4998]
+    values[spikes] = [10, -10, 25, 7]
+    keep = minmax_indices(values, 50)
+    assert set(spikes) <= set(keep)
+    assert len(keep) <= 50
+
+
+def test_nan_buckets_are_skipped():
+    values = np.cumsum(np.random.default_rng(0).normal(size=2000))
+    values[100:900] = np.nan
+    values[1500] = np.nan
+    keep = minmax_indices(values, 40)
+    assert_envelope(values, keep, 40)
+    assert np.nanargmax(values) in keep and np.nanargmin(values) in keep
+
+    # a series with nothing but missing values is still cut down to maxPoints
+    assert len(minmax_indices(np.full(2000, np.nan), 40)) <= 40
+
+
+@pytest.mark.parametrize('first, last', [(0, 4999), (0, 100), (2000, 3000), (4900, 4999), (1234, 1234), (10, 30)])
+def test_window_keeps_the_visible_days_and_one_either_side(first, last):
+    values = np.cumsum(np.random.default_rng(first).normal(size=5000))
+    keep = window_indices(values, first, last, 60)
+    assert_envelope(values, keep, 60, max(first - 1, 0), min(last + 1, len(values) - 1))
+
+
+@pytest.fixture
+def lineChartApp(make_app):
+    return make_app('chart', 1000, lineChartMaxPoints=40)
+
+
+# this function sends the line chart callback of France the way the browser does, changed is the input that fired it
+def post_line_chart(app, relayoutData, changed='line-chart.relayoutData'):
+    inputs = [{'id': 'countryDropdown1', 'property': 'value', 'value': 'France'},
+              {'id': 'lineViewRadio', 'property': 'value', 'value': 'daily'},
+              {'id': 'line-chart', 'property': 'relayoutData', 'value': relayoutData}]
+    return app.server.test_client().post('/_dash-update-component', json={
+        'output': 'line-chart.figure', 'outputs': {'id': 'line-chart', 'property': 'figure'}, 'inputs': inputs,
+        'changedPropIds': [changed], 'state': []})
+
+
+# this function asks the app for the line chart of France, returning its lines
+def request_line_chart(app, relayoutData, changed='line-chart.relayoutData'):
+    response = post_line_chart(app, relayoutData, changed)
+    assert response.status_code == 200
+    figure = response.get_json()['response']['line-chart']['figure']
+    return {line['name']: pd.to_datetime(line['x']) for line in figure['data']}
+
+
+def test_zooming_redraws_the_visible_dates(lineChartApp):
+    with lineChartApp.server.app_context():
+        dates = pd.DatetimeIndex(Dashboard.current_data().dates)
+
+    # a newly chosen country and a double click that zooms back out draw the whole range
+    for relayoutData, changed in [(None, 'countryDropdown1.value'),
+                                  ({'xaxis.autorange': True}, 'line-chart.relayoutData')]:
+        for x in request_line_chart(lineChartApp, relayoutData, changed).values():
+            assert len(x) <= 40
+            assert x[0] == dates[0] and x[-1] == dates[-1]
+
+    # both forms of relayoutData plotly sends when zooming in
+    for relayoutData in [{'xaxis.range[0]': str(dates[300].date()), 'xaxis.range[1]': str(dates[400].date())},
+                         {'xaxis.range': [str(dates[300].date()) + ' 00:00:00', str(dates[400].date())]}]:
+        lines = request_line_chart(lineChartApp, relayoutData)
+        assert set(lines) == {'deaths', 'recovered', 'active', 'confirmed'}
+        for x in lines.values():
+            assert len(x) <= 40
+            # the lines run one day past each edge of the zoomed chart
+            assert x[0] == dates[299] and x[-1] == dates[401]
+            # the zoomed window has more detail than the whole range squeezed into the same number of points
+            assert np.median(np.diff(x.values)) < (dates[-1] - dates[0]) / 40
+
+
+def test_relayouts_that_keep_the_dates_keep_the_chart(lineChartApp):
+    # panning, zooming the y axis and resizing leave a zoomed in chart as it was drawn
+    for relayoutData in [{'dragmode': 'pan'}, {'yaxis.range[0]': 0, 'yaxis.range[1]': 100}, {'autosize': True}]:
+        assert post_line_chart(lineChartApp, relayoutData).status_code == 204
+
+    # choosing another view still redraws the chart
+    assert post_line_chart(lineChartApp, {'dragmode': 'pan'}, changed='lineViewRadio.value').status_code == 200
@@ -0,0 +1,116 @@
+# checks that ingest.ingest_covid_data reads the csv files into the same data as the original pandas preparation in
+# data_prep.prepare_datasets, on synthetic data and on small files with the awkward rows of the real data
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_prep
+from ingest import ingest_covid_data
+from synthetic_data import generate_datasets
+
+header = 'Province/State,Country/Region,Lat,Long,1/22/20,1/23/20,1/24/20,1/25/20\n'
+
+# locations without a Lat and Long, a province with a comma in it and a country without a province
+edgeConfirmed = header + '''\
+,Afghanistan,33.93911,67.709953,0,1,3,5
+Alberta,Canada,53.9333,-116.5765,1,2,4,8
+Repatriated Travellers,Canada,,,0,0,1,1
+"Bonaire, Sint Eustatius and Saba",Netherlands,12.1784,-68.2385,2,2,3,3
+,Namibia,-22.9576,18.4904,0,0,0,0
+Unknown,China,,,0,0,0,0
+'''
+edgeDeaths = header + '''\
+,Afghanistan,33.93911,67.709953,0,0,1,1
+Alberta,Canada,53.9333,-116.5765,0,0,0,1
+Repatriated Travellers,Canada,,,0,0,0,0
+"Bonaire, Sint Eustatius and Saba",Netherlands,12.1784,-68.2385,0,0,1,1
+,Namibia,-22.9576,18.4904,0,0,0,0
+Unknown,China,,,0,0,0,0
+'''
+# the recovered file has a date less, rows in another order, a location the confirmed file does not have and is
+# missing some of its locations, like the real recovered file
+edgeRecovered = '''\
+Province/State,Country/Region,Lat,Long,1/22/20,1/23/20,1/24/20
+,Namibia,-22.9576,18.4904,0,0,0
+,Canada,56.1304,-106.3468,0,1,2
+,Afghanistan,33.93911,67.709953,0,0,1
+"Bonaire, Sint Eustatius and Saba",Netherlands,12.1784,-68.2385,0,0,1
+'''
+
+
+# this function writes the three csv files to a directory and returns their sources
+def write_sources(directory, confirmed, deaths, recovered):
+    for metric, text in [('confirmed', confirmed), ('deaths', deaths), ('recovered', recovered)]:
+        with open(os.path.join(directory, data_prep.datasetFiles[metric]), 'w') as csvFile:
+            csvFile.write(text)
+    return data_prep.dataset_sources(str(directory))
+
+
+# this function checks the data frames of the ingested dataset are the ones the original preparation gives
+def assert_matches_prepare_datasets(covidData, sources):
+    expected = data_prep.prepare_datasets(*data_prep.read_datasets(sources))
+    for name, expectedFrame, keys in [
+            ('frame', expected[0], ['date', 'Country/Region']),
+            ('locationFrame', expected[1], ['date', 'Country/Region', 'Province/State', 'Lat', 'Long']),
+            ('globalFrame', expected[2], ['date'])]:
+        columns = list(expectedFrame.columns)
+        pd.testing.assert_frame_equal(getattr(covidData, name)[columns].sort_values(keys).reset_index(drop=True),
+                                      expectedFrame.sort_values(keys).reset_index(drop=True), check_dtype=False,
+                                      obj=name)
+
+
+@pytest.fixture
+def syntheticSources(tmp_path):
+    generate_datasets(str(tmp_path), locations=40, days=90)
+    return data_prep.dataset_sources(str(tmp_path))
+
+
+def test_synthetic_data_matches_prepare_datasets(syntheticSources):
+    assert_matches_prepare_datasets(ingest_covid_data(syntheticSources), syntheticSources)
+
+
+def test_edge_cases_match_prepare_datasets(tmp_path):
+    sources = write_sources(tmp_path, edgeConfirmed, edgeDeaths, edgeRecovered)
+    covidData = ingest_covid_data(sources)
+    assert_matches_prepare_datasets(covidData, sources)
+
+    # the recovered location that is not in the confirmed file is dropped and the date it lacks is 0
+    assert list(covidData.countries) == ['Afghanistan', 'Canada', 'China', 'Namibia', 'Netherlands']
+    canada = list(covidData.countries).index('Canada')
+    assert covidData.values[canada, :, covidData.metricIndex['recovered']].tolist() == [0, 0, 0, 0]
+    afghanistan = list(covidData.countries).index('Afghanistan')
+    assert covidData.values[afghanistan, :, covidData.metricIndex['recovered']].tolist() == [0, 0, 1, 0]
+
+
+def test_process_pool_gives_the_same_data(syntheticSources, monkeypatch):
+    expected = ingest_covid_data(syntheticSources)
+    monkeypatch.setattr(os, 'cpu_count', lambda: 3)
+    covidData = ingest_covid_data(syntheticSources)
+    np.testing.assert_array_equal(covidData.locationValues, expected.locationValues)
+    np.testing.assert_array_equal(covidData.values, expected.values)
+
+
+def test_repeated_and_missing_locations_match_build_covid_data(tmp_path):
+    # Alberta is repeated in every file, only its first row is used, and Namibia has no deaths row
+    repeated = 'Alberta,Canada,53.9333,-116.5765,9,9,9,9\n'
+    deaths = edgeDeaths.replace(',Namibia,-22.9576,18.4904,0,0,0,0\n', '')
+    sources = write_sources(tmp_path, edgeConfirmed + repeated, deaths + repeated,
+                            edgeRecovered + 'Alberta,Canada,53.9333,-116.5765,9,9,9\n' * 2)
+    covidData = ingest_covid_data(sources)
+    expected = data_prep.build_covid_data(*data_prep.read_datasets(sources))
+    np.testing.assert_array_equal(covidData.values, expected.values)
+    assert list(covidData.countries) == list(expected.countries)
+
+    namibia = list(covidData.countries).index('Namibia')
+    assert covidData.values[namibia, :, covidData.metricIndex['deaths']].tolist() == [0, 0, 0, 0]
+
+
+def test_date_columns_read_only_those_dates(syntheticSources):
+    covidData = ingest_covid_data(syntheticSources)
+    dateColumns = ['{}/{}/{}'.format(date.month, date.day, date.strftime('%y')) for date in
+                   pd.DatetimeIndex(covidData.dates[-5:])]
+    newDates = ingest_covid_data(syntheticSources, dateColumns=dateColumns)
+    np.testing.assert_array_equal(newDates.dates, covidData.dates[-5:])
+    np.testing.assert_array_equal(newDates.locationValues, covidData.locationValues[:, -5:])
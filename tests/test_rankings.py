@@ -0,0 +1,66 @@
+# checks the leaderboard rankings against sorting the per country data frame, and that rankings extended with new
+# dates are the ones worked out from scratch
+import numpy as np
+import pytest
+
+import data_prep
+from covid_data import CovidData
+from ingest import ingest_covid_data
+from rankings import compute_rankings, top_on_date, top_over_range
+from synthetic_data import generate_datasets
+
+
+@pytest.fixture
+def syntheticSources(tmp_path):
+    generate_datasets(str(tmp_path), locations=60, days=120)
+    return data_prep.dataset_sources(str(tmp_path))
+
+
+# this function returns the count countries expected at the top of a series of values by country, highest first and
+# countries with the same value in alphabetical order
+def expected_top(values, count):
+    ordered = values.reset_index().sort_values([values.name, 'Country/Region'], ascending=[False, True])
+    return list(ordered['Country/Region'][:count]), list(ordered[values.name][:count])
+
+
+@pytest.mark.parametrize('count', [1, 10, 1000])
+def test_rankings_match_sorting_the_frame(syntheticSources, count):
+    covidData = ingest_covid_data(syntheticSources)
+    frame = covidData.frame.set_index(['date', 'Country/Region'])
+    dayCount = len(covidData.dates)
+    for metric in covidData.metrics:
+        for first, last in [(0, dayCount - 1), (dayCount // 3, dayCount // 2), (dayCount - 1, dayCount - 1)]:
+            totals = frame[metric].xs(covidData.dates[last], level='date').astype('int64')
+            change = totals - (frame[metric].xs(covidData.dates[first - 1], level='date') if first > 0 else 0)
+
+            countries, values = top_on_date(covidData, metric, last, count)
+            assert (list(covidData.countries[countries]), list(values)) == expected_top(totals, count)
+            countries, values = top_over_range(covidData, metric, first, last, count)
+            assert (list(covidData.countries[countries]), list(values)) == expected_top(change, count)
+
+
+def test_ties_keep_alphabetical_order():
+    # five countries over two dates, with Beta, Gamma and Delta tied on the last date and over the range
+    countries = np.array(['Alpha', 'Beta', 'Delta', 'Gamma', 'Omega'], dtype=object)
+    values = np.zeros((5, 2, 4), dtype='int32')
+    values[:, :, 0] = [[1, 3], [0, 5], [0, 5], [0, 5], [0, 9]]
+    covidData = CovidData(np.array(['2020-01-22', '2020-01-23'], dtype='datetime64[ns]'), countries, values,
+                          np.full(5, np.nan, dtype=object), np.arange(5), np.zeros(5, dtype='float32'),
+                          np.zeros(5, dtype='float32'), values)
+
+    countries, totals = top_on_date(covidData, 'confirmed', 1, 3)
+    assert list(covidData.countries[countries]) == ['Omega', 'Beta', 'Delta'] and list(totals) == [9, 5, 5]
+    countries, change = top_over_range(covidData, 'confirmed', 1, 1, 3)
+    assert list(covidData.countries[countries]) == ['Omega', 'Beta', 'Delta'] and list(change) == [9, 5, 5]
+
+
+def test_extended_rankings_match_a_full_rebuild(syntheticSources):
+    covidData = ingest_covid_data(syntheticSources)
+    dateColumns = ['{}/{}/{}'.format(date.month, date.day, date.strftime('%y')) for date in
+                   covidData.dates[:100].astype('datetime64[D]').tolist()]
+    earlier = ingest_covid_data(syntheticSources, dateColumns=dateColumns)
+    earlier.rankings
+
+    extended = earlier.extend(covidData.dates_from(100))
+    np.testing.assert_array_equal(extended.rankings, compute_rankings(covidData.values))
+    np.testing.assert_array_equal(extended.rankings, covidData.rankings)
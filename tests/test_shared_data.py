@@ -0,0 +1,30 @@
+# checks a published dataset can be read by workers running as another user, and that a worker keeps its dataset
+# when the version it is pointed at can not be loaded
+import os
+import stat
+
+import data_prep
+from data_refresh import DataStore
+from ingest import ingest_covid_data
+from shared_data import SharedDataFollower, pointerFile, publish_shared
+from synthetic_data import generate_datasets
+
+
+def test_published_files_are_readable_by_everyone(tmp_path):
+    generate_datasets(str(tmp_path / 'data'), locations=20, days=30)
+    sharedDir = str(tmp_path / 'shared')
+    version = publish_shared(sharedDir, ingest_covid_data(data_prep.dataset_sources(str(tmp_path / 'data'))))
+
+    assert stat.S_IMODE(os.stat(os.path.join(sharedDir, pointerFile)).st_mode) == 0o644
+    assert stat.S_IMODE(os.stat(os.path.join(sharedDir, version)).st_mode) == 0o755
+
+
+def test_a_version_that_can_not_be_loaded_is_not_attached(tmp_path):
+    generate_datasets(str(tmp_path / 'data'), locations=20, days=30)
+    covidData = ingest_covid_data(data_prep.dataset_sources(str(tmp_path / 'data')))
+    with open(os.path.join(str(tmp_path), pointerFile), 'w') as pointer:
+        pointer.write('missing')
+    store = DataStore(covidData)
+
+    assert not SharedDataFollower(store, str(tmp_path)).refresh()
+    assert store.current is covidData